@@ -0,0 +1,68 @@
+from os import chmod, path, remove, replace, stat, umask
+from tempfile import NamedTemporaryFile
+from typing import IO, Optional
+
+# file written under a temporary name next to file_path, then swapped in
+# with one rename by commit, so readers never see it partly written and an
+# interrupted run leaves the old file (or none) instead of a truncated one
+#   with AtomicFile("font.vlw") as f:
+#       vlw.write_stream(f.file)
+#       f.commit()
+# leaving the with block without commit (e.g. on an exception) discards it
+# the file gets the mode of the file it replaces, or the usual mode for new
+# files (0666 less umask), not the 0600 of temporary files
+class AtomicFile:
+    file_path: str
+    file: IO # the temporary file, write to this
+    
+    _done: bool
+    
+    _umask: Optional[int] = None # process umask, read once
+    
+    def __init__(self, file_path: str, mode: str = "wb"):
+        self.file_path = file_path
+        self.file = NamedTemporaryFile(mode, dir=path.dirname(path.abspath(file_path)), delete=False)
+        self._done = False
+    
+    def __enter__(self) -> "AtomicFile":
+        return self
+    
+    def __exit__(self, *exc):
+        self.discard()
+    
+    # close the temporary file (if not closed already) and move it to file_path
+    def commit(self):
+        if self._done:
+            return
+        self.file.close()
+        try:
+            chmod(self.file.name, AtomicFile._mode_for(self.file_path))
+            replace(self.file.name, self.file_path)
+        except:
+            self.discard()
+            raise
+        self._done = True
+    
+    # close and delete the temporary file, unless committed already
+    def discard(self):
+        if self._done:
+            return
+        self._done = True
+        self.file.close()
+        try:
+            remove(self.file.name)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def _mode_for(file_path: str) -> int:
+        try:
+            return stat(file_path).st_mode & 0o7777
+        except FileNotFoundError:
+            pass
+        
+        if AtomicFile._umask is None:
+            # umask can only be read by setting it
+            AtomicFile._umask = umask(0o022)
+            umask(AtomicFile._umask)
+        return 0o666 & ~AtomicFile._umask
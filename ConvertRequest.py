@@ -0,0 +1,172 @@
+import base64
+from io import BytesIO
+from os import path
+from typing import TYPE_CHECKING, Callable, Optional
+
+import vlwconv
+from AtomicFile import AtomicFile
+from UnicodeRange import UnicodeBlockKeys, UnicodeRangeSet
+
+if TYPE_CHECKING:
+    import freetype
+
+# one conversion (a font at one or more sizes, with one charset) described
+# by a dict using the command line's option names, as sent to the conversion
+# server or listed in a build manifest, e.g.
+#   {"font": "font.ttf", "sizes": [12, 16], "blocks": ["basic_latin"], "output": "font{size}.vlw"}
+class ConvertRequest:
+    # keys a request dict may have; "size" is a shorthand for one-element "sizes"
+    KEYS = ("font", "ttc_index", "fallbacks", "size", "sizes", "blocks", "ranges", "chars", "chars_from",
+        "exclude_blocks", "exclude_ranges", "exclude_chars", "gamma", "contrast", "threshold", "min_alpha", "output")
+    
+    font: str
+    ttc_index: int
+    fallbacks: list[str] # fallback font files for characters font lacks, in priority order
+    sizes: list[int]
+    blocks: list[str]
+    ranges: list[str]
+    chars: str
+    chars_from: list[str]
+    exclude_blocks: list[str]
+    exclude_ranges: list[str]
+    exclude_chars: str
+    gamma: float # bitmap adjustments, see vlwconv.make_bitmap_lut
+    contrast: float
+    threshold: Optional[int]
+    min_alpha: int
+    output: Optional[str] # file name, may contain "{size}" and "{name}"; None returns fonts as bytes
+    
+    # validate request dict d and make a ConvertRequest from it
+    # relative font, fallbacks, chars_from and output paths are taken relative to base_dir
+    @staticmethod
+    def from_dict(d: dict, base_dir: str = "") -> "ConvertRequest":
+        unknown = set(d) - set(ConvertRequest.KEYS)
+        if unknown:
+            raise ValueError("Unknown request keys: {}".format(", ".join(sorted(unknown))))
+        
+        def get(key: str, kind: type, default):
+            v = d.get(key, default)
+            if not isinstance(v, kind):
+                raise ValueError("Request key \"{}\" must be {}".format(key, kind.__name__))
+            return v
+        
+        def get_number(key: str, default: float) -> float:
+            v = d.get(key, default)
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                raise ValueError("Request key \"{}\" must be a number".format(key))
+            return v
+        
+        def get_list(key: str, kind: type) -> list:
+            v = get(key, list, [])
+            for item in v:
+                if not isinstance(item, kind):
+                    raise ValueError("Request key \"{}\" must be a list of {}".format(key, kind.__name__))
+            return v
+        
+        r = ConvertRequest()
+        if "font" not in d:
+            raise ValueError("Request has no font")
+        r.font = path.join(base_dir, get("font", str, ""))
+        r.ttc_index = get("ttc_index", int, 0)
+        r.fallbacks = [path.join(base_dir, f) for f in get_list("fallbacks", str)]
+        
+        if "sizes" in d:
+            r.sizes = list(dict.fromkeys(get_list("sizes", int)))
+        elif "size" in d:
+            r.sizes = [get("size", int, 0)]
+        else:
+            r.sizes = []
+        if (len(r.sizes) == 0):
+            raise ValueError("No font size given.")
+        for size in r.sizes:
+            if (size <= 0):
+                raise ValueError("Font size must be greater than 0.")
+        
+        r.blocks = get_list("blocks", str)
+        r.ranges = get_list("ranges", str)
+        r.chars = get("chars", str, "")
+        r.chars_from = [path.join(base_dir, f) for f in get_list("chars_from", str)]
+        r.exclude_blocks = get_list("exclude_blocks", str)
+        r.exclude_ranges = get_list("exclude_ranges", str)
+        r.exclude_chars = get("exclude_chars", str, "")
+        for b in r.blocks + r.exclude_blocks:
+            if b not in UnicodeBlockKeys:
+                raise ValueError("Unknown Unicode block \"{}\"".format(b))
+        if "-" in r.chars_from:
+            raise ValueError("chars_from can't read stdin here")
+        
+        r.gamma = get_number("gamma", 1.0)
+        r.contrast = get_number("contrast", 1.0)
+        r.threshold = None if d.get("threshold") is None else get("threshold", int, 0)
+        r.min_alpha = get("min_alpha", int, 0)
+        r.bitmap_lut() # validates them
+        
+        r.output = None
+        if "output" in d:
+            r.output = path.join(base_dir, get("output", str, ""))
+            if (len(r.sizes) > 1 and "{size}" not in r.output):
+                raise ValueError("Output file name must contain \"{size}\" when converting multiple sizes.")
+        
+        return r
+    
+    # request as a dict with every key, as from_dict takes it
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in ConvertRequest.KEYS if k != "size"}
+    
+    def charset(self) -> UnicodeRangeSet:
+        return vlwconv.gen_charset(self.blocks, self.ranges, self.chars,
+            self.exclude_blocks, self.exclude_ranges, self.exclude_chars, self.chars_from)
+    
+    def bitmap_lut(self) -> Optional[bytes]:
+        return vlwconv.make_bitmap_lut(self.gamma, self.contrast, self.threshold, self.min_alpha)
+    
+    # files run writes, one per size, with output's "{size}" and "{name}"
+    # filled in; the face is opened by open_face (as for run) only if output
+    # contains "{name}"
+    def output_files(self, open_face: Callable[[str, int], "freetype.Face"] = vlwconv.load_face) -> list[str]:
+        if self.output is None:
+            return []
+        
+        name = ""
+        if "{name}" in self.output:
+            name = vlwconv.face_name(open_face(self.font, self.ttc_index))
+        return [vlwconv.output_file_for(self.output, size, name) for size in self.sizes]
+    
+    # convert, returns a response:
+    #   {"ok": true, "glyphs": 95, "missing": 0, "fonts": [...]}
+    # with {"size": 12, "vlw": "<base64>"} per size if output is None,
+    # otherwise files are written and listed as {"size": 12, "file": ..., "bytes": ...}
+    # faces are opened by open_face(font file, ttc index), e.g. from a cache of open faces
+    def run(self, open_face: Callable[[str, int], "freetype.Face"] = vlwconv.load_face) -> dict:
+        face = open_face(self.font, self.ttc_index)
+        faces = [face] + [open_face(f, 0) for f in self.fallbacks]
+        charset = self.charset()
+        if (not charset):
+            raise ValueError("No characters to generate. Make sure to specify blocks, ranges, chars, or text files.")
+        charmaps = vlwconv.route_charmaps([vlwconv.face_charmap(f, charset) for f in faces])
+        parts = [(f, charmap, "", 0) for f, charmap in zip(faces, charmaps)]
+        glyph_count = sum(len(charmap) for charmap in charmaps)
+        bitmap_lut = self.bitmap_lut()
+        
+        fonts = []
+        for size in self.sizes:
+            vlw = vlwconv.font_info(face, size)
+            vlw.bitmap_lut = bitmap_lut
+            glyphs = vlwconv.iter_merged_glyphs(parts, size)
+            
+            if self.output is None:
+                buf = BytesIO()
+                vlw.write_glyph_stream(buf, glyphs)
+                fonts.append({"size": size, "vlw": base64.b64encode(buf.getvalue()).decode("ascii")})
+                continue
+            
+            # write next to the destination, then swap it in once complete, so
+            # readers never see a partly written file
+            # (vlw.name is face_name(face), as output_files names them)
+            output_file = vlwconv.output_file_for(self.output, size, vlw.name)
+            with AtomicFile(output_file) as f:
+                vlw.write_glyph_stream(f.file, glyphs)
+                f.commit()
+            fonts.append({"size": size, "file": output_file, "bytes": path.getsize(output_file)})
+        
+        return {"ok": True, "glyphs": glyph_count, "missing": len(charset) - glyph_count, "fonts": fonts}
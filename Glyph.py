@@ -1,16 +1,23 @@
 from io import BufferedIOBase, RawIOBase
+from struct import Struct
 from typing import Union
 
 AnyIOBase = Union[BufferedIOBase, RawIOBase]
 
+# glyph header: codepoint, height, width, advance, top bearing, left bearing, padding
+# all big-endian signed 32-bit ints
+HeaderStruct = Struct(">7i")
+
 class Glyph:
+    __slots__ = ("codepoint", "bitmap_height", "bitmap_width", "advance", "bearing_y", "bearing_x", "bitmap_buf")
+    
     codepoint: int # codepoint of glyph
     bitmap_height: int # height of bitmap
     bitmap_width: int # width of bitmap
     advance: int # cursor advance amount
     bearing_y: int # y offset to draw glyph at (may be negative)
     bearing_x: int # x offset to draw glyph at (may be negative)
-    bitmap_buf: bytearray # ensure stride == width on data written here
+    bitmap_buf: Union[bytearray, memoryview] # ensure stride == width on data written here
     
     def bitmap_string(self) -> str:
         out: str = ""
@@ -23,15 +30,24 @@ class Glyph:
         
         return out
     
+    # copy of glyph for another codepoint (sharing the same glyph index),
+    # sharing its bitmap buffer rather than copying it
+    def for_codepoint(self, codepoint: int) -> "Glyph":
+        g = Glyph()
+        g.codepoint = codepoint
+        g.bitmap_height = self.bitmap_height
+        g.bitmap_width = self.bitmap_width
+        g.advance = self.advance
+        g.bearing_y = self.bearing_y
+        g.bearing_x = self.bearing_x
+        g.bitmap_buf = self.bitmap_buf
+        return g
+    
     # write glyph header to stream
     def write_header(self, io: AnyIOBase):
-        io.write(self.codepoint.to_bytes(4, byteorder="big", signed=True))     # codepoint
-        io.write(self.bitmap_height.to_bytes(4, byteorder="big", signed=True)) # height
-        io.write(self.bitmap_width.to_bytes(4, byteorder="big", signed=True))  # width
-        io.write(self.advance.to_bytes(4, byteorder="big", signed=True))       # advance
-        io.write(self.bearing_y.to_bytes(4, byteorder="big", signed=True))     # top bearing
-        io.write(self.bearing_x.to_bytes(4, byteorder="big", signed=True))     # left bearing
-        io.write((0).to_bytes(4, byteorder="big", signed=True))                # padding
+        io.write(HeaderStruct.pack(
+            self.codepoint, self.bitmap_height, self.bitmap_width,
+            self.advance, self.bearing_y, self.bearing_x, 0))
     
     # write glyph bitmap to stream
     def write_bitmap(self, io: AnyIOBase):
@@ -0,0 +1,196 @@
+from hashlib import sha256
+from os import makedirs, path
+from time import time
+from typing import TYPE_CHECKING, Iterable, Union
+from Glyph import Glyph
+
+# sqlite3 is imported when a cache is opened, not by everything importing this
+if TYPE_CHECKING:
+    import sqlite3
+
+# persistent cache of rendered glyphs, shared between runs (and processes)
+# glyphs are keyed on font (see font_key), size and glyph index, and stored
+# without codepoint since several codepoints may share one glyph index
+# backed by a single sqlite file in WAL mode, so concurrent builds can read
+# and write it safely; least recently used glyphs are evicted past max_size
+class GlyphCache:
+    FILE_NAME = "glyphs.sqlite3"
+    ENTRY_OVERHEAD = 64 # rough per-glyph bytes on top of the bitmap, for max_size
+    EVICT_TO = 0.9 # when over max_size, evict down to this fraction of it
+    BATCH = 500 # glyph indices per query, below sqlite's parameter limit
+    
+    _db: "sqlite3.Connection"
+    _max_size: int
+    
+    def __init__(self, cache_dir: str, max_size: int = 256 << 20):
+        import sqlite3
+        
+        makedirs(cache_dir, exist_ok=True)
+        self._max_size = max_size
+        
+        # autocommit mode; writes use explicit BEGIN IMMEDIATE so concurrent
+        # writers queue on the lock (for up to timeout seconds) instead of failing
+        self._db = sqlite3.connect(path.join(cache_dir, GlyphCache.FILE_NAME), timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        
+        # one transaction, so concurrent first runs don't race creating the schema
+        self._db.executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS glyphs (
+                font TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                glyph_index INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                advance INTEGER NOT NULL,
+                bearing_y INTEGER NOT NULL,
+                bearing_x INTEGER NOT NULL,
+                bitmap BLOB NOT NULL,
+                used REAL NOT NULL,
+                UNIQUE (font, size, glyph_index)
+            );
+            CREATE INDEX IF NOT EXISTS glyphs_used ON glyphs (used);
+            
+            -- running total of cache size, kept up to date by triggers
+            CREATE TABLE IF NOT EXISTS total (bytes INTEGER NOT NULL);
+            INSERT INTO total SELECT 0 WHERE NOT EXISTS (SELECT * FROM total);
+            CREATE TRIGGER IF NOT EXISTS glyphs_insert AFTER INSERT ON glyphs BEGIN
+                UPDATE total SET bytes = bytes + length(NEW.bitmap) + {overhead};
+            END;
+            CREATE TRIGGER IF NOT EXISTS glyphs_delete AFTER DELETE ON glyphs BEGIN
+                UPDATE total SET bytes = bytes - length(OLD.bitmap) - {overhead};
+            END;
+            COMMIT;
+        """.format(overhead=GlyphCache.ENTRY_OVERHEAD))
+    
+    def close(self):
+        self._db.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    # key identifying everything that affects rendering besides size and glyph
+    # index: font file content, face index, load flags and FreeType version
+    # font is a font file path or its content (see also font_hash)
+    @staticmethod
+    def font_key(font: Union[str, bytes], ttc_index: int, load_flags: int, ft_version: tuple) -> str:
+        return GlyphCache.font_key_from_hash(GlyphCache.font_hash(font), ttc_index, load_flags, ft_version)
+    
+    # as font_key, with the font content hashed already by font_hash
+    # (lets all faces of a collection share one hash of the file)
+    @staticmethod
+    def font_key_from_hash(font_hash: str, ttc_index: int, load_flags: int, ft_version: tuple) -> str:
+        return "{}:{}:{}:{}".format(font_hash, ttc_index, load_flags, ".".join(str(v) for v in ft_version))
+    
+    # hash of font file content, font is a file path or the content itself
+    @staticmethod
+    def font_hash(font: Union[str, bytes]) -> str:
+        h = sha256()
+        if isinstance(font, bytes):
+            h.update(font)
+        else:
+            with open(font, "rb") as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+        
+        return h.hexdigest()
+    
+    # which of glyph_indices are cached for font at size
+    def cached_indices(self, font: str, size: int, glyph_indices: Iterable[int]) -> set[int]:
+        out = set()
+        for batch in GlyphCache._batches(list(set(glyph_indices))):
+            rows = self._db.execute(
+                "SELECT glyph_index FROM glyphs WHERE font = ? AND size = ? AND glyph_index IN ({})".format(",".join("?" * len(batch))),
+                [font, size] + batch)
+            out.update(r[0] for r in rows)
+        
+        return out
+    
+    # cached glyphs for font at size, keyed by glyph index
+    # glyphs have codepoint 0, missing glyph indices are left out
+    # also marks returned glyphs as recently used
+    def get_glyphs(self, font: str, size: int, glyph_indices: Iterable[int]) -> dict[int, Glyph]:
+        out: dict[int, Glyph] = {}
+        for batch in GlyphCache._batches(list(set(glyph_indices))):
+            params = [font, size] + batch
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                "SELECT glyph_index, height, width, advance, bearing_y, bearing_x, bitmap FROM glyphs "
+                "WHERE font = ? AND size = ? AND glyph_index IN ({})".format(placeholders),
+                params)
+            for idx, height, width, advance, bearing_y, bearing_x, bitmap in rows:
+                g = Glyph()
+                g.codepoint = 0
+                g.bitmap_height = height
+                g.bitmap_width = width
+                g.advance = advance
+                g.bearing_y = bearing_y
+                g.bearing_x = bearing_x
+                g.bitmap_buf = bytearray(bitmap)
+                out[idx] = g
+            
+            self._write(
+                "UPDATE glyphs SET used = ? WHERE font = ? AND size = ? AND glyph_index IN ({})".format(placeholders),
+                [time()] + params)
+        
+        return out
+    
+    # store glyphs (keyed by glyph index) for font at size, then evict
+    # least recently used glyphs if the cache grew past max_size
+    def put_glyphs(self, font: str, size: int, glyphs: dict[int, Glyph]):
+        if not glyphs:
+            return
+        
+        now = time()
+        rows = [(font, size, idx, g.bitmap_height, g.bitmap_width, g.advance, g.bearing_y, g.bearing_x, bytes(g.bitmap_buf), now)
+            for idx, g in glyphs.items()]
+        
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            # another build may have stored the same glyph meanwhile; it's identical
+            self._db.executemany("INSERT OR IGNORE INTO glyphs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._db.execute("COMMIT")
+        except:
+            self._db.execute("ROLLBACK")
+            raise
+    
+    # total size of cache as counted against max_size
+    @property
+    def size(self) -> int:
+        return self._db.execute("SELECT bytes FROM total").fetchone()[0]
+    
+    # delete least recently used glyphs until below EVICT_TO * max_size
+    # must be called inside a write transaction
+    def _evict(self):
+        if self.size <= self._max_size:
+            return
+        
+        target = int(self._max_size * GlyphCache.EVICT_TO)
+        while self.size > target:
+            cur = self._db.execute(
+                "DELETE FROM glyphs WHERE rowid IN (SELECT rowid FROM glyphs ORDER BY used LIMIT ?)",
+                [GlyphCache.BATCH])
+            if cur.rowcount == 0:
+                break
+    
+    def _write(self, sql: str, params: list):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute(sql, params)
+            self._db.execute("COMMIT")
+        except:
+            self._db.execute("ROLLBACK")
+            raise
+    
+    @staticmethod
+    def _batches(items: list) -> Iterable[list]:
+        for i in range(0, len(items), GlyphCache.BATCH):
+            yield items[i:i+GlyphCache.BATCH]
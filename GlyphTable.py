@@ -0,0 +1,162 @@
+from array import array
+from bisect import bisect_left
+from sys import byteorder
+from typing import Iterable, Iterator, Optional
+from Glyph import Glyph, HeaderStruct
+
+# compact, codepoint-sorted store for many glyphs
+# metrics are kept in one array('i') column each and all bitmaps in a single
+# contiguous arena, instead of one Python object (plus bytearray) per glyph
+# bitmaps are handed out as memoryviews into the arena without copying; while
+# any such view is alive the arena can't grow, so add raises BufferError
+# (leaving the table unchanged) until they're released
+class GlyphTable:
+    _codepoints: array    # 'i' codepoint of glyph, sorted ascending
+    _heights: array       # 'i' height of bitmap
+    _widths: array        # 'i' width of bitmap
+    _advances: array      # 'i' cursor advance amount
+    _bearings_y: array    # 'i' y offset to draw glyph at
+    _bearings_x: array    # 'i' x offset to draw glyph at
+    _offsets: array       # 'q' offset of bitmap in _arena
+    _lengths: array       # 'q' length of bitmap in _arena
+    _arena: bytearray     # bitmap data of all glyphs
+    _arena_sorted: bool   # bitmaps in _arena are contiguous and in codepoint order
+    
+    def __init__(self, glyphs: Iterable[Glyph] = ()):
+        self._codepoints = array("i")
+        self._heights = array("i")
+        self._widths = array("i")
+        self._advances = array("i")
+        self._bearings_y = array("i")
+        self._bearings_x = array("i")
+        self._offsets = array("q")
+        self._lengths = array("q")
+        self._arena = bytearray()
+        self._arena_sorted = True
+        
+        for g in glyphs:
+            self.add(g)
+    
+    def __repr__(self) -> str:
+        return "GlyphTable({} glyphs, {} bitmap bytes)".format(len(self), len(self._arena))
+    
+    def __len__(self) -> int:
+        return len(self._codepoints)
+    
+    # glyph at row i, as a Glyph whose bitmap_buf is a memoryview into the
+    # arena (no copy); metric changes on the returned Glyph aren't stored back
+    # (copy the bitmap, e.g. bytes(g.bitmap_buf), to keep it while adding glyphs)
+    def __getitem__(self, i: int) -> Glyph:
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("glyph index out of range", i)
+        
+        g = Glyph()
+        g.codepoint = self._codepoints[i]
+        g.bitmap_height = self._heights[i]
+        g.bitmap_width = self._widths[i]
+        g.advance = self._advances[i]
+        g.bearing_y = self._bearings_y[i]
+        g.bearing_x = self._bearings_x[i]
+        offset = self._offsets[i]
+        g.bitmap_buf = memoryview(self._arena)[offset:offset+self._lengths[i]]
+        return g
+    
+    def __iter__(self) -> Iterator[Glyph]:
+        for i in range(0, len(self)):
+            yield self[i]
+    
+    def __contains__(self, codepoint: int) -> bool:
+        return self.find(codepoint) is not None
+    
+    # row of glyph for codepoint (binary search), or None if not in table
+    def find(self, codepoint: int) -> Optional[int]:
+        i = bisect_left(self._codepoints, codepoint)
+        if i < len(self._codepoints) and self._codepoints[i] == codepoint:
+            return i
+        return None
+    
+    # glyph for codepoint, or None if not in table
+    def get(self, codepoint: int) -> Optional[Glyph]:
+        i = self.find(codepoint)
+        return None if i is None else self[i]
+    
+    # sorted codepoints of all glyphs (don't modify)
+    @property
+    def codepoints(self) -> array:
+        return self._codepoints
+    
+    # total size of all bitmaps in bytes
+    @property
+    def bitmap_size(self) -> int:
+        return sum(self._lengths)
+    
+    # insert glyph, keeping table sorted by codepoint
+    # appending in codepoint order is the fast path; glyph data is copied
+    # the bitmap goes into the arena first, the only step that can fail (see
+    # above), so a failed add leaves no row behind
+    def add(self, g: Glyph):
+        length = g.bitmap_width * g.bitmap_height
+        if len(g.bitmap_buf) != length:
+            raise ValueError("bitmap size doesn't match width * height", g.codepoint, len(g.bitmap_buf), length)
+        
+        i = len(self._codepoints)
+        arena_sorted = self._arena_sorted
+        if i > 0 and g.codepoint <= self._codepoints[-1]:
+            i = bisect_left(self._codepoints, g.codepoint)
+            if self._codepoints[i] == g.codepoint:
+                raise ValueError("glyph for codepoint already in table", g.codepoint)
+            arena_sorted = False
+        
+        offset = len(self._arena)
+        self._arena += g.bitmap_buf
+        self._arena_sorted = arena_sorted
+        
+        self._codepoints.insert(i, g.codepoint)
+        self._heights.insert(i, g.bitmap_height)
+        self._widths.insert(i, g.bitmap_width)
+        self._advances.insert(i, g.advance)
+        self._bearings_y.insert(i, g.bearing_y)
+        self._bearings_x.insert(i, g.bearing_x)
+        self._offsets.insert(i, offset)
+        self._lengths.insert(i, length)
+    
+    # all bitmaps, contiguous and in codepoint order, as written to VLW
+    # returned without copying (unless out-of-order adds need compacting first),
+    # so release the view before adding more glyphs
+    def bitmap_arena(self) -> memoryview:
+        if not self._arena_sorted:
+            self._compact()
+        return memoryview(self._arena)
+    
+    # rebuild arena in codepoint order, dropping unreferenced bytes
+    def _compact(self):
+        arena = bytearray()
+        offsets = array("q")
+        view = memoryview(self._arena)
+        for offset, length in zip(self._offsets, self._lengths):
+            offsets.append(len(arena))
+            arena += view[offset:offset+length]
+        view.release()
+        
+        self._arena = arena
+        self._offsets = offsets
+        self._arena_sorted = True
+    
+    # glyph headers of all glyphs packed as in VLW (HeaderStruct per glyph)
+    # built by interleaving whole columns instead of packing row by row
+    def pack_headers(self) -> array:
+        fields = HeaderStruct.size // 4
+        table = array("i", bytes(HeaderStruct.size * len(self)))
+        table[0::fields] = self._codepoints
+        table[1::fields] = self._heights
+        table[2::fields] = self._widths
+        table[3::fields] = self._advances
+        table[4::fields] = self._bearings_y
+        table[5::fields] = self._bearings_x
+        # table[6::fields] is padding, left as 0
+        
+        if byteorder == "little":
+            table.byteswap() # VLW is big-endian
+        return table
@@ -0,0 +1,172 @@
+import json
+from hashlib import sha256
+from os import path, stat
+from typing import TYPE_CHECKING, Optional
+
+import vlwconv
+from AtomicFile import AtomicFile
+from ConvertRequest import ConvertRequest
+from GlyphCache import GlyphCache
+
+if TYPE_CHECKING:
+    import freetype
+
+# build manifest: list of conversion targets (ConvertRequest dicts, each with
+# an output), as TOML
+#   [defaults]
+#   blocks = ["basic_latin"]
+#
+#   [[targets]]
+#   font = "fonts/Lato-Regular.ttf"
+#   sizes = [12, 16]
+#   output = "out/lato{size}.vlw"
+# or the same as JSON ({"defaults": {...}, "targets": [{...}, ...]})
+# keys in defaults apply to every target that doesn't set them; relative
+# paths are relative to the manifest
+# outputs are checked for collisions as the files actually written, with
+# "{size}" and "{name}" filled in (see ConvertRequest.output_files)
+# each target records a stamp next to each of its outputs (see stamp_path)
+# so it's only rebuilt when its fonts, text files, options or the converter
+# change
+class Manifest:
+    # source files of the converter itself, as part of every target's stamp
+    TOOL_FILES = ["vlwconv.py", "ConvertRequest.py", "UnicodeRange.py", "Glyph.py", "GlyphTable.py", "VlwFont.py"]
+    
+    targets: list[ConvertRequest]
+    
+    _outputs: dict[ConvertRequest, list[str]] # target -> its output files
+    _tool_version: Optional[str]
+    _hashes: dict[str, str] # file path -> content hash, for files hashed this run
+    
+    # outputs are the output files of each target (in the same order)
+    def __init__(self, targets: list[ConvertRequest], outputs: list[list[str]]):
+        self.targets = targets
+        self._outputs = dict(zip(targets, outputs))
+        self._tool_version = None
+        self._hashes = {}
+    
+    @staticmethod
+    def load(file_path: str) -> "Manifest":
+        if file_path.endswith(".toml"):
+            try:
+                import tomllib
+            except ImportError:
+                raise Exception("TOML manifests need Python 3.11 or later, use JSON instead.")
+            with open(file_path, "rb") as f:
+                d = tomllib.load(f)
+        else:
+            with open(file_path, "rb") as f:
+                d = json.load(f)
+        
+        # faces are only opened for outputs containing "{name}", each once
+        faces: dict[tuple[str, int], "freetype.Face"] = {}
+        def open_face(font: str, ttc_index: int) -> "freetype.Face":
+            if (font, ttc_index) not in faces:
+                if (not path.isfile(font)):
+                    raise ValueError("Font file (\"{}\") does not exist.".format(font))
+                faces[(font, ttc_index)] = vlwconv.load_face(font, ttc_index)
+            return faces[(font, ttc_index)]
+        
+        defaults = d.get("defaults", {})
+        base_dir = path.dirname(path.abspath(file_path))
+        targets = []
+        outputs = []
+        written = set()
+        for i, t in enumerate(d.get("targets", [])):
+            try:
+                target = ConvertRequest.from_dict(dict(defaults, **t), base_dir)
+                target_outputs = target.output_files(open_face)
+            except ValueError as e:
+                raise Exception("Manifest target {}: {}".format(i + 1, e))
+            if target.output is None:
+                raise Exception("Manifest target {} has no output.".format(i + 1))
+            for output_file in target_outputs:
+                if output_file in written:
+                    raise Exception("Manifest has more than one target writing \"{}\".".format(output_file))
+                written.add(output_file)
+            targets.append(target)
+            outputs.append(target_outputs)
+        
+        return Manifest(targets, outputs)
+    
+    # files target writes, see ConvertRequest.output_files
+    def outputs(self, target: ConvertRequest) -> list[str]:
+        return self._outputs[target]
+    
+    # stamp file of one output file of a target: its name plus ".stamp"
+    @staticmethod
+    def stamp_path(output_file: str) -> str:
+        return output_file + ".stamp"
+    
+    # hash of the converter's own source and FreeType version, so changing
+    # either rebuilds every target
+    def tool_version(self) -> str:
+        if self._tool_version is None:
+            import freetype
+            h = sha256(".".join(str(v) for v in freetype.version()).encode("ascii"))
+            base_dir = path.dirname(path.abspath(__file__))
+            for f in Manifest.TOOL_FILES:
+                h.update(self._file_hash(path.join(base_dir, f), None).encode("ascii"))
+            self._tool_version = h.hexdigest()
+        
+        return self._tool_version
+    
+    # stamp of target: key (hash of tool version, options and input file
+    # content) and, per input file, [size, mtime, content hash] so inputs
+    # unchanged on disk since the last stamp don't need hashing again
+    def stamp(self, target: ConvertRequest, old: Optional[dict] = None) -> dict:
+        old_inputs = old.get("inputs", {}) if old is not None else {}
+        inputs = {}
+        for f in [target.font] + target.fallbacks + target.chars_from:
+            st = stat(f)
+            inputs[f] = [st.st_size, st.st_mtime_ns, self._file_hash(f, old_inputs.get(f), st)]
+        
+        key = sha256(json.dumps({
+            "tool": self.tool_version(),
+            "request": target.to_dict(),
+            "inputs": {f: v[2] for f, v in inputs.items()},
+        }, sort_keys=True).encode("utf-8")).hexdigest()
+        
+        return {"key": key, "inputs": inputs}
+    
+    # stamp recorded for output_file by write_stamp, None if there's none (or it's unreadable)
+    @staticmethod
+    def read_stamp(output_file: str) -> Optional[dict]:
+        try:
+            with open(Manifest.stamp_path(output_file), "rb") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    # stamp of target as it would be built now, and whether all its outputs
+    # exist and were built with that stamp already
+    def check(self, target: ConvertRequest) -> tuple[bool, dict]:
+        olds = [Manifest.read_stamp(f) for f in self.outputs(target)]
+        stamp = self.stamp(target, next((old for old in olds if old is not None), None))
+        for f, old in zip(self.outputs(target), olds):
+            if (old is None or old.get("key") != stamp["key"] or not path.isfile(f)):
+                return False, stamp
+        
+        return True, stamp
+    
+    # record that target was built with stamp (from check, taken before
+    # building so inputs changing meanwhile aren't missed), next to each of
+    # its outputs
+    def write_stamp(self, target: ConvertRequest, stamp: dict):
+        for output_file in self.outputs(target):
+            with AtomicFile(Manifest.stamp_path(output_file), "w") as f:
+                json.dump(stamp, f.file, indent=2)
+                f.commit()
+    
+    # content hash of file, reusing old ([size, mtime, hash] from an earlier
+    # stamp) if the file's size and mtime (from st) still match it
+    def _file_hash(self, file_path: str, old: Optional[list], st=None) -> str:
+        if file_path in self._hashes:
+            return self._hashes[file_path]
+        
+        if (old is not None and st is not None and old[:2] == [st.st_size, st.st_mtime_ns]):
+            h = old[2]
+        else:
+            h = GlyphCache.font_hash(file_path)
+        self._hashes[file_path] = h
+        return h
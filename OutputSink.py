@@ -0,0 +1,187 @@
+import re
+import zlib
+from io import BufferedIOBase, RawIOBase, TextIOBase
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+
+if TYPE_CHECKING:
+    import hashlib
+
+AnyIOBase = Union[BufferedIOBase, RawIOBase]
+
+# destinations a VLW file is encoded to as it's written: VlwFont's write
+# methods only call write/writelines on the stream they're given, so one
+# serialization pass can feed several encodings of it through a TeeSink, e.g.
+#   with TeeSink([open("font.vlw", "wb"), CArraySink(open("font.h", "w"), "font")]) as out:
+#       vlw.write_stream(out)
+# every sink encodes as data arrives, holding at most part of one line
+class OutputSink:
+    def write(self, b) -> int:
+        raise NotImplementedError()
+    
+    def writelines(self, lines: Iterable):
+        for b in lines:
+            self.write(b)
+    
+    # finish the encoding and close the underlying file
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+# passes everything written on to several sinks (OutputSinks or binary files)
+class TeeSink(OutputSink):
+    sinks: list[Union[OutputSink, AnyIOBase]]
+    
+    def __init__(self, sinks: Iterable[Union[OutputSink, AnyIOBase]]):
+        self.sinks = list(sinks)
+    
+    def write(self, b) -> int:
+        for sink in self.sinks:
+            sink.write(b)
+        return len(b)
+    
+    def writelines(self, lines: Iterable):
+        lines = list(lines)
+        for sink in self.sinks:
+            sink.writelines(lines)
+    
+    # closes every sink, even if closing one of them fails
+    def close(self):
+        error = None
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+# C/C++ header defining the data as a PROGMEM byte array (as TFT_eSPI's
+# loadFont takes it) plus its length, like xxd -i
+class CArraySink(OutputSink):
+    BYTES_PER_LINE = 16
+    
+    _io: TextIOBase
+    _name: str
+    _pending: bytes # start of a line not complete yet
+    _length: int
+    
+    def __init__(self, io: TextIOBase, name: str):
+        self._io = io
+        self._name = name
+        self._pending = b""
+        self._length = 0
+        
+        io.write("#pragma once\n"
+            "#include <stdint.h>\n"
+            "#ifndef PROGMEM\n"
+            "#define PROGMEM\n"
+            "#endif\n"
+            "\n"
+            "const uint8_t {}[] PROGMEM = {{\n".format(name))
+    
+    # name made into a valid C identifier, e.g. "lato-16" -> "lato_16"
+    @staticmethod
+    def identifier(name: str) -> str:
+        name = re.sub(r"\W", "_", name, flags=re.ASCII)
+        return "_" + name if name == "" or name[0].isdigit() else name
+    
+    def write(self, b) -> int:
+        data = memoryview(b).cast("B")
+        n = len(data)
+        self._length += n
+        
+        if self._pending:
+            fill = CArraySink.BYTES_PER_LINE - len(self._pending)
+            self._pending += data[:fill]
+            data = data[fill:]
+            if len(self._pending) < CArraySink.BYTES_PER_LINE:
+                return n
+            self._write_lines(self._pending)
+            self._pending = b""
+        
+        # whole lines are formatted in one go, the rest waits for more data
+        full = len(data) - len(data) % CArraySink.BYTES_PER_LINE
+        self._write_lines(data[:full])
+        self._pending = bytes(data[full:])
+        return n
+    
+    def close(self):
+        self._write_lines(self._pending)
+        self._pending = b""
+        self._io.write("}};\nconst uint32_t {}_len = {};\n".format(self._name, self._length))
+        self._io.close()
+    
+    # write data as lines of "0x.., " (the last one may be short)
+    def _write_lines(self, data: Union[bytes, memoryview]):
+        step = CArraySink.BYTES_PER_LINE
+        self._io.write("".join(["  0x" + data[i:i+step].hex(" ").replace(" ", ", 0x") + ",\n"
+            for i in range(0, len(data), step)]))
+
+# hash of the data, written as a sidecar file in sha256sum's format
+# ("<hex digest>  <file name>") once closed
+class HashSink(OutputSink):
+    ALGORITHMS = ("crc32", "md5", "sha1", "sha256", "sha512")
+    
+    _io: TextIOBase
+    _file_name: str
+    _hash: Optional["hashlib._Hash"]
+    _crc: int # running crc32, if algorithm is "crc32" (not in hashlib)
+    
+    # file_name is the name of the hashed file, as written in the sidecar
+    def __init__(self, io: TextIOBase, file_name: str, algorithm: str = "sha256"):
+        if algorithm not in HashSink.ALGORITHMS:
+            raise ValueError("Unknown hash algorithm", algorithm)
+        
+        self._io = io
+        self._file_name = file_name
+        self._hash = None
+        if algorithm != "crc32":
+            # hashlib is slow to import, and crc32 doesn't need it
+            import hashlib
+            self._hash = hashlib.new(algorithm)
+        self._crc = 0
+    
+    def write(self, b) -> int:
+        if self._hash is None:
+            self._crc = zlib.crc32(b, self._crc)
+        else:
+            self._hash.update(b)
+        return len(b)
+    
+    def hexdigest(self) -> str:
+        return "{:08x}".format(self._crc) if self._hash is None else self._hash.hexdigest()
+    
+    def close(self):
+        self._io.write("{}  {}\n".format(self.hexdigest(), self._file_name))
+        self._io.close()
+
+# data compressed as a zlib stream or an xz file
+class CompressedSink(OutputSink):
+    EXTENSIONS = {"zlib": ".z", "lzma": ".xz"}
+    
+    _io: AnyIOBase
+    _compressor: object # zlib or lzma compressor, same interface
+    
+    def __init__(self, io: AnyIOBase, method: str = "zlib"):
+        if method == "zlib":
+            self._compressor = zlib.compressobj(9)
+        elif method == "lzma":
+            # lzma is an optional part of Python builds, only needed here
+            import lzma
+            self._compressor = lzma.LZMACompressor(lzma.FORMAT_XZ)
+        else:
+            raise ValueError("Unknown compression method", method)
+        self._io = io
+    
+    def write(self, b) -> int:
+        self._io.write(self._compressor.compress(b))
+        return len(b)
+    
+    def close(self):
+        self._io.write(self._compressor.flush())
+        self._io.close()
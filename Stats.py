@@ -0,0 +1,145 @@
+import json
+from contextlib import contextmanager
+from hashlib import blake2b
+from heapq import heappush, heappushpop
+from time import perf_counter, process_time
+from typing import Hashable, Iterable, Iterator, Optional
+from Glyph import Glyph
+
+# collects per-stage wall and CPU time plus counters for a conversion run
+# stages nest: time spent in an inner stage isn't counted for the outer one,
+# so e.g. rendering pulled from inside the VLW writer counts as rendering
+# CPU time is for this process only (not parallel rendering workers)
+class Stats:
+    stages: dict[str, list[float]] # stage name -> [wall seconds, cpu seconds]
+    counters: dict[str, int]
+    outputs: list[dict] # one entry per file written
+    largest: list[tuple[int, int, int, int, int]] # heap of (bytes, size, codepoint, width, height)
+    
+    _largest_count: int
+    _stack: list[list] # [stage name, wall start, cpu start] of running stages
+    
+    def __init__(self, largest_count: int = 5):
+        self.stages = {}
+        self.counters = {}
+        self.outputs = []
+        self.largest = []
+        self._largest_count = largest_count
+        self._stack = []
+    
+    # time the enclosed block as stage name
+    @contextmanager
+    def stage(self, name: str):
+        self._start(name)
+        try:
+            yield
+        finally:
+            self._stop()
+    
+    def _start(self, name: str):
+        wall, cpu = perf_counter(), process_time()
+        if self._stack:
+            self._add_time(self._stack[-1], wall, cpu) # pause outer stage
+        self._stack.append([name, wall, cpu])
+    
+    def _stop(self):
+        wall, cpu = perf_counter(), process_time()
+        self._add_time(self._stack.pop(), wall, cpu)
+        if self._stack:
+            self._stack[-1][1:] = [wall, cpu] # resume outer stage
+    
+    def _add_time(self, entry: list, wall: float, cpu: float):
+        totals = self.stages.setdefault(entry[0], [0.0, 0.0])
+        totals[0] += wall - entry[1]
+        totals[1] += cpu - entry[2]
+    
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+    
+    # pass glyphs through, timing how long each takes to produce as stage
+    # and counting glyphs, bitmap bytes and the largest bitmaps
+    # also counts bitmaps byte-identical to an earlier one of the same font
+    # (identical_bitmaps, identical_bytes), as these can't be shared in VLW
+    # glyph_keys maps codepoints to their glyph (e.g. glyph index); codepoints
+    # sharing a glyph are counted as shared_glyphs instead, so only the first
+    # of them is compared
+    def track_glyphs(self, glyphs: Iterable[Glyph], size: int, stage: str = "render",
+            glyph_keys: Optional[dict[int, Hashable]] = None) -> Iterator[Glyph]:
+        it = iter(glyphs)
+        seen: set[tuple[int, int, bytes]] = set() # (width, height, bitmap digest)
+        seen_glyphs: set[Hashable] = set() # glyph_keys of glyphs compared already
+        while True:
+            self._start(stage)
+            try:
+                g = next(it)
+            except StopIteration:
+                return
+            finally:
+                self._stop()
+            
+            length = len(g.bitmap_buf)
+            self.count("glyphs")
+            self.count("bitmap_bytes", length)
+            entry = (length, size, g.codepoint, g.bitmap_width, g.bitmap_height)
+            
+            glyph_key = None if glyph_keys is None else glyph_keys.get(g.codepoint)
+            if glyph_key is not None:
+                shared = glyph_key in seen_glyphs
+                seen_glyphs.add(glyph_key)
+            else:
+                shared = False
+            
+            if length > 0 and not shared:
+                key = (g.bitmap_width, g.bitmap_height, blake2b(g.bitmap_buf, digest_size=16).digest())
+                if key in seen:
+                    self.count("identical_bitmaps")
+                    self.count("identical_bytes", length)
+                else:
+                    seen.add(key)
+            if len(self.largest) < self._largest_count:
+                heappush(self.largest, entry)
+            elif entry > self.largest[0]:
+                heappushpop(self.largest, entry)
+            
+            yield g
+    
+    def add_output(self, file_path: str, size: int, file_size: int):
+        self.outputs.append({"file": file_path, "size": size, "bytes": file_size})
+        self.count("output_bytes", file_size)
+    
+    def to_dict(self) -> dict:
+        return {
+            "stages": {k: {"wall": v[0], "cpu": v[1]} for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            "largest_glyphs": [{"bytes": b, "size": s, "codepoint": c, "width": w, "height": h}
+                for b, s, c, w, h in sorted(self.largest, reverse=True)],
+            "outputs": list(self.outputs),
+        }
+    
+    def report_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+    
+    def report_text(self) -> str:
+        out: str = "Stage            Wall (s)   CPU (s)\n"
+        for k, (wall, cpu) in self.stages.items():
+            out += "  {:<14} {:>8.3f}  {:>8.3f}\n".format(k, wall, cpu)
+        
+        out += "Counters\n"
+        for k, v in self.counters.items():
+            out += "  {:<17} {:>8}\n".format(k, v)
+        
+        if "identical_bitmaps" in self.counters or self.counters.get("shared_glyphs"):
+            out += "Duplicates: {} codepoints share another's glyph, {} bitmaps ({} bytes) are identical to another\n".format(
+                self.counters.get("shared_glyphs", 0), self.counters.get("identical_bitmaps", 0), self.counters.get("identical_bytes", 0))
+        
+        if self.largest:
+            out += "Largest glyphs\n"
+            for b, s, c, w, h in sorted(self.largest, reverse=True):
+                out += "  U+{:04X} at {}px: {}x{} ({} bytes)\n".format(c, s, w, h, b)
+        
+        if self.outputs:
+            out += "Outputs\n"
+            for o in self.outputs:
+                out += "  {} ({}px): {} bytes\n".format(o["file"], o["size"], o["bytes"])
+        
+        return out
@@ -1,4 +1,5 @@
-from typing import Optional
+from bisect import bisect_right
+from typing import Iterable, Iterator, Optional, Union
 
 class UnicodeRange:
     _begin: int
@@ -69,174 +70,324 @@ class UnicodeRange:
     def name(self) -> str:
         return self._name
 
+# set of codepoints stored as sorted, disjoint, non-adjacent inclusive intervals
+# supports union (|), intersection (&) and difference (-) without ever
+# expanding the intervals into individual codepoints
+class UnicodeRangeSet:
+    _begins: list[int]
+    _ends: list[int] # _ends[i] is the inclusive end of interval beginning at _begins[i]
+    
+    def __init__(self, ranges: Iterable[Union[UnicodeRange, tuple[int, int]]] = ()):
+        pairs = []
+        for r in ranges:
+            if isinstance(r, UnicodeRange):
+                pairs.append((r.begin, r.end))
+            else:
+                begin, end = r
+                if (begin < 0):
+                    raise ValueError("begin must not be negative", begin)
+                if (end < begin):
+                    raise ValueError("end must not be smaller than begin", begin, end)
+                pairs.append((begin, end))
+        
+        self._begins, self._ends = UnicodeRangeSet._normalize(pairs)
+    
+    # sort and merge overlapping or adjacent intervals
+    @staticmethod
+    def _normalize(pairs: list[tuple[int, int]]) -> tuple[list[int], list[int]]:
+        begins: list[int] = []
+        ends: list[int] = []
+        for begin, end in sorted(pairs):
+            if ends and begin <= ends[-1] + 1:
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                begins.append(begin)
+                ends.append(end)
+        
+        return begins, ends
+    
+    @staticmethod
+    def _from_sorted(begins: list[int], ends: list[int]):
+        out = UnicodeRangeSet()
+        out._begins = begins
+        out._ends = ends
+        return out
+    
+    # build from individual codepoints (any order, duplicates allowed)
+    @staticmethod
+    def from_codepoints(codepoints: Iterable[int]):
+        begins: list[int] = []
+        ends: list[int] = []
+        for c in sorted(set(codepoints)):
+            if ends and c == ends[-1] + 1:
+                ends[-1] = c
+            else:
+                begins.append(c)
+                ends.append(c)
+        
+        return UnicodeRangeSet._from_sorted(begins, ends)
+    
+    def __repr__(self) -> str:
+        return "UnicodeRangeSet([{}])".format(", ".join("(0x{:04x}, 0x{:04x})".format(b, e) for b, e in self.ranges()))
+    
+    # list of (begin, end) inclusive intervals, sorted
+    def ranges(self) -> list[tuple[int, int]]:
+        return list(zip(self._begins, self._ends))
+    
+    # number of codepoints in set
+    def __len__(self) -> int:
+        return sum(e - b + 1 for b, e in zip(self._begins, self._ends))
+    
+    def __bool__(self) -> bool:
+        return len(self._begins) > 0
+    
+    # iterate all codepoints in ascending order
+    def __iter__(self) -> Iterator[int]:
+        for b, e in zip(self._begins, self._ends):
+            yield from range(b, e + 1)
+    
+    def __contains__(self, c: int) -> bool:
+        i = bisect_right(self._begins, c) - 1
+        return i >= 0 and c <= self._ends[i]
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, UnicodeRangeSet):
+            return NotImplemented
+        return self._begins == other._begins and self._ends == other._ends
+    
+    def union(self, other: "UnicodeRangeSet") -> "UnicodeRangeSet":
+        begins, ends = UnicodeRangeSet._normalize(self.ranges() + other.ranges())
+        return UnicodeRangeSet._from_sorted(begins, ends)
+    
+    def intersection(self, other: "UnicodeRangeSet") -> "UnicodeRangeSet":
+        begins: list[int] = []
+        ends: list[int] = []
+        i = j = 0
+        while i < len(self._begins) and j < len(other._begins):
+            begin = max(self._begins[i], other._begins[j])
+            end = min(self._ends[i], other._ends[j])
+            if begin <= end:
+                begins.append(begin)
+                ends.append(end)
+            # advance whichever interval finishes first
+            if self._ends[i] < other._ends[j]:
+                i += 1
+            else:
+                j += 1
+        
+        return UnicodeRangeSet._from_sorted(begins, ends)
+    
+    def difference(self, other: "UnicodeRangeSet") -> "UnicodeRangeSet":
+        begins: list[int] = []
+        ends: list[int] = []
+        j = 0
+        for begin, end in zip(self._begins, self._ends):
+            # skip removed intervals entirely before this one
+            while j < len(other._begins) and other._ends[j] < begin:
+                j += 1
+            k = j
+            while k < len(other._begins) and other._begins[k] <= end:
+                if other._begins[k] > begin:
+                    begins.append(begin)
+                    ends.append(other._begins[k] - 1)
+                begin = other._ends[k] + 1
+                if begin > end:
+                    break
+                k += 1
+            if begin <= end:
+                begins.append(begin)
+                ends.append(end)
+        
+        return UnicodeRangeSet._from_sorted(begins, ends)
+    
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
 # Unicode blocks from https://en.wikipedia.org/wiki/Unicode_block#List_of_blocks
 # only BMP included because it's already a long list
-UnicodeBlocks = [
-    UnicodeRange(0x0000, 0x007F, "Basic Latin"),
-    UnicodeRange(0x0080, 0x00FF, "Latin-1 Supplement"),
-    UnicodeRange(0x0100, 0x017F, "Latin Extended-A"),
-    UnicodeRange(0x0180, 0x024F, "Latin Extended-B"),
-    UnicodeRange(0x0250, 0x02AF, "IPA Extensions"),
-    UnicodeRange(0x02B0, 0x02FF, "Spacing Modifier Letters"),
-    UnicodeRange(0x0300, 0x036F, "Combining Diacritical Marks"),
-    UnicodeRange(0x0370, 0x03FF, "Greek and Coptic"),
-    UnicodeRange(0x0400, 0x04FF, "Cyrillic"),
-    UnicodeRange(0x0500, 0x052F, "Cyrillic Supplement"),
-    UnicodeRange(0x0530, 0x058F, "Armenian"),
-    UnicodeRange(0x0590, 0x05FF, "Hebrew"),
-    UnicodeRange(0x0600, 0x06FF, "Arabic"),
-    UnicodeRange(0x0700, 0x074F, "Syriac"),
-    UnicodeRange(0x0750, 0x077F, "Arabic Supplement"),
-    UnicodeRange(0x0780, 0x07BF, "Thaana"),
-    UnicodeRange(0x07C0, 0x07FF, "NKo"),
-    UnicodeRange(0x0800, 0x083F, "Samaritan"),
-    UnicodeRange(0x0840, 0x085F, "Mandaic"),
-    UnicodeRange(0x0860, 0x086F, "Syriac Supplement"),
-    UnicodeRange(0x0870, 0x089F, "Arabic Extended-B"),
-    UnicodeRange(0x08A0, 0x08FF, "Arabic Extended-A"),
-    UnicodeRange(0x0900, 0x097F, "Devanagari"),
-    UnicodeRange(0x0980, 0x09FF, "Bengali"),
-    UnicodeRange(0x0A00, 0x0A7F, "Gurmukhi"),
-    UnicodeRange(0x0A80, 0x0AFF, "Gujarati"),
-    UnicodeRange(0x0B00, 0x0B7F, "Oriya"),
-    UnicodeRange(0x0B80, 0x0BFF, "Tamil"),
-    UnicodeRange(0x0C00, 0x0C7F, "Telugu"),
-    UnicodeRange(0x0C80, 0x0CFF, "Kannada"),
-    UnicodeRange(0x0D00, 0x0D7F, "Malayalam"),
-    UnicodeRange(0x0D80, 0x0DFF, "Sinhala"),
-    UnicodeRange(0x0E00, 0x0E7F, "Thai"),
-    UnicodeRange(0x0E80, 0x0EFF, "Lao"),
-    UnicodeRange(0x0F00, 0x0FFF, "Tibetan"),
-    UnicodeRange(0x1000, 0x109F, "Myanmar"),
-    UnicodeRange(0x10A0, 0x10FF, "Georgian"),
-    UnicodeRange(0x1100, 0x11FF, "Hangul Jamo"),
-    UnicodeRange(0x1200, 0x137F, "Ethiopic"),
-    UnicodeRange(0x1380, 0x139F, "Ethiopic Supplement"),
-    UnicodeRange(0x13A0, 0x13FF, "Cherokee"),
-    UnicodeRange(0x1400, 0x167F, "Unified Canadian Aboriginal Syllabics"),
-    UnicodeRange(0x1680, 0x169F, "Ogham"),
-    UnicodeRange(0x16A0, 0x16FF, "Runic"),
-    UnicodeRange(0x1700, 0x171F, "Tagalog"),
-    UnicodeRange(0x1720, 0x173F, "Hanunoo"),
-    UnicodeRange(0x1740, 0x175F, "Buhid"),
-    UnicodeRange(0x1760, 0x177F, "Tagbanwa"),
-    UnicodeRange(0x1780, 0x17FF, "Khmer"),
-    UnicodeRange(0x1800, 0x18AF, "Mongolian"),
-    UnicodeRange(0x18B0, 0x18FF, "Unified Canadian Aboriginal Syllabics Extended"),
-    UnicodeRange(0x1900, 0x194F, "Limbu"),
-    UnicodeRange(0x1950, 0x197F, "Tai Le"),
-    UnicodeRange(0x1980, 0x19DF, "New Tai Lue"),
-    UnicodeRange(0x19E0, 0x19FF, "Khmer Symbols"),
-    UnicodeRange(0x1A00, 0x1A1F, "Buginese"),
-    UnicodeRange(0x1A20, 0x1AAF, "Tai Tham"),
-    UnicodeRange(0x1AB0, 0x1AFF, "Combining Diacritical Marks Extended"),
-    UnicodeRange(0x1B00, 0x1B7F, "Balinese"),
-    UnicodeRange(0x1B80, 0x1BBF, "Sundanese"),
-    UnicodeRange(0x1BC0, 0x1BFF, "Batak"),
-    UnicodeRange(0x1C00, 0x1C4F, "Lepcha"),
-    UnicodeRange(0x1C50, 0x1C7F, "Ol Chiki"),
-    UnicodeRange(0x1C80, 0x1C8F, "Cyrillic Extended-C"),
-    UnicodeRange(0x1C90, 0x1CBF, "Georgian Extended"),
-    UnicodeRange(0x1CC0, 0x1CCF, "Sundanese Supplement"),
-    UnicodeRange(0x1CD0, 0x1CFF, "Vedic Extensions"),
-    UnicodeRange(0x1D00, 0x1D7F, "Phonetic Extensions"),
-    UnicodeRange(0x1D80, 0x1DBF, "Phonetic Extensions Supplement"),
-    UnicodeRange(0x1DC0, 0x1DFF, "Combining Diacritical Marks Supplement"),
-    UnicodeRange(0x1E00, 0x1EFF, "Latin Extended Additional"),
-    UnicodeRange(0x1F00, 0x1FFF, "Greek Extended"),
-    UnicodeRange(0x2000, 0x206F, "General Punctuation"),
-    UnicodeRange(0x2070, 0x209F, "Superscripts and Subscripts"),
-    UnicodeRange(0x20A0, 0x20CF, "Currency Symbols"),
-    UnicodeRange(0x20D0, 0x20FF, "Combining Diacritical Marks for Symbols"),
-    UnicodeRange(0x2100, 0x214F, "Letterlike Symbols"),
-    UnicodeRange(0x2150, 0x218F, "Number Forms"),
-    UnicodeRange(0x2190, 0x21FF, "Arrows"),
-    UnicodeRange(0x2200, 0x22FF, "Mathematical Operators"),
-    UnicodeRange(0x2300, 0x23FF, "Miscellaneous Technical"),
-    UnicodeRange(0x2400, 0x243F, "Control Pictures"),
-    UnicodeRange(0x2440, 0x245F, "Optical Character Recognition"),
-    UnicodeRange(0x2460, 0x24FF, "Enclosed Alphanumerics"),
-    UnicodeRange(0x2500, 0x257F, "Box Drawing"),
-    UnicodeRange(0x2580, 0x259F, "Block Elements"),
-    UnicodeRange(0x25A0, 0x25FF, "Geometric Shapes"),
-    UnicodeRange(0x2600, 0x26FF, "Miscellaneous Symbols"),
-    UnicodeRange(0x2700, 0x27BF, "Dingbats"),
-    UnicodeRange(0x27C0, 0x27EF, "Miscellaneous Mathematical Symbols-A"),
-    UnicodeRange(0x27F0, 0x27FF, "Supplemental Arrows-A"),
-    UnicodeRange(0x2800, 0x28FF, "Braille Patterns"),
-    UnicodeRange(0x2900, 0x297F, "Supplemental Arrows-B"),
-    UnicodeRange(0x2980, 0x29FF, "Miscellaneous Mathematical Symbols-B"),
-    UnicodeRange(0x2A00, 0x2AFF, "Supplemental Mathematical Operators"),
-    UnicodeRange(0x2B00, 0x2BFF, "Miscellaneous Symbols and Arrows"),
-    UnicodeRange(0x2C00, 0x2C5F, "Glagolitic"),
-    UnicodeRange(0x2C60, 0x2C7F, "Latin Extended-C"),
-    UnicodeRange(0x2C80, 0x2CFF, "Coptic"),
-    UnicodeRange(0x2D00, 0x2D2F, "Georgian Supplement"),
-    UnicodeRange(0x2D30, 0x2D7F, "Tifinagh"),
-    UnicodeRange(0x2D80, 0x2DDF, "Ethiopic Extended"),
-    UnicodeRange(0x2DE0, 0x2DFF, "Cyrillic Extended-A"),
-    UnicodeRange(0x2E00, 0x2E7F, "Supplemental Punctuation"),
-    UnicodeRange(0x2E80, 0x2EFF, "CJK Radicals Supplement"),
-    UnicodeRange(0x2F00, 0x2FDF, "Kangxi Radicals"),
-    UnicodeRange(0x2FF0, 0x2FFF, "Ideographic Description Characters"),
-    UnicodeRange(0x3000, 0x303F, "CJK Symbols and Punctuation"),
-    UnicodeRange(0x3040, 0x309F, "Hiragana"),
-    UnicodeRange(0x30A0, 0x30FF, "Katakana"),
-    UnicodeRange(0x3100, 0x312F, "Bopomofo"),
-    UnicodeRange(0x3130, 0x318F, "Hangul Compatibility Jamo"),
-    UnicodeRange(0x3190, 0x319F, "Kanbun"),
-    UnicodeRange(0x31A0, 0x31BF, "Bopomofo Extended"),
-    UnicodeRange(0x31C0, 0x31EF, "CJK Strokes"),
-    UnicodeRange(0x31F0, 0x31FF, "Katakana Phonetic Extensions"),
-    UnicodeRange(0x3200, 0x32FF, "Enclosed CJK Letters and Months"),
-    UnicodeRange(0x3300, 0x33FF, "CJK Compatibility"),
-    UnicodeRange(0x3400, 0x4DBF, "CJK Unified Ideographs Extension A"),
-    UnicodeRange(0x4DC0, 0x4DFF, "Yijing Hexagram Symbols"),
-    UnicodeRange(0x4E00, 0x9FFF, "CJK Unified Ideographs"),
-    UnicodeRange(0xA000, 0xA48F, "Yi Syllables"),
-    UnicodeRange(0xA490, 0xA4CF, "Yi Radicals"),
-    UnicodeRange(0xA4D0, 0xA4FF, "Lisu"),
-    UnicodeRange(0xA500, 0xA63F, "Vai"),
-    UnicodeRange(0xA640, 0xA69F, "Cyrillic Extended-B"),
-    UnicodeRange(0xA6A0, 0xA6FF, "Bamum"),
-    UnicodeRange(0xA700, 0xA71F, "Modifier Tone Letters"),
-    UnicodeRange(0xA720, 0xA7FF, "Latin Extended-D"),
-    UnicodeRange(0xA800, 0xA82F, "Syloti Nagri"),
-    UnicodeRange(0xA830, 0xA83F, "Common Indic Number Forms"),
-    UnicodeRange(0xA840, 0xA87F, "Phags-pa"),
-    UnicodeRange(0xA880, 0xA8DF, "Saurashtra"),
-    UnicodeRange(0xA8E0, 0xA8FF, "Devanagari Extended"),
-    UnicodeRange(0xA900, 0xA92F, "Kayah Li"),
-    UnicodeRange(0xA930, 0xA95F, "Rejang"),
-    UnicodeRange(0xA960, 0xA97F, "Hangul Jamo Extended-A"),
-    UnicodeRange(0xA980, 0xA9DF, "Javanese"),
-    UnicodeRange(0xA9E0, 0xA9FF, "Myanmar Extended-B"),
-    UnicodeRange(0xAA00, 0xAA5F, "Cham"),
-    UnicodeRange(0xAA60, 0xAA7F, "Myanmar Extended-A"),
-    UnicodeRange(0xAA80, 0xAADF, "Tai Viet"),
-    UnicodeRange(0xAAE0, 0xAAFF, "Meetei Mayek Extensions"),
-    UnicodeRange(0xAB00, 0xAB2F, "Ethiopic Extended-A"),
-    UnicodeRange(0xAB30, 0xAB6F, "Latin Extended-E"),
-    UnicodeRange(0xAB70, 0xABBF, "Cherokee Supplement"),
-    UnicodeRange(0xABC0, 0xABFF, "Meetei Mayek"),
-    UnicodeRange(0xAC00, 0xD7AF, "Hangul Syllables"),
-    UnicodeRange(0xD7B0, 0xD7FF, "Hangul Jamo Extended-B"),
-    UnicodeRange(0xD800, 0xDB7F, "High Surrogates"),
-    UnicodeRange(0xDB80, 0xDBFF, "High Private Use Surrogates"),
-    UnicodeRange(0xDC00, 0xDFFF, "Low Surrogates"),
-    UnicodeRange(0xE000, 0xF8FF, "Private Use Area"),
-    UnicodeRange(0xF900, 0xFAFF, "CJK Compatibility Ideographs"),
-    UnicodeRange(0xFB00, 0xFB4F, "Alphabetic Presentation Forms"),
-    UnicodeRange(0xFB50, 0xFDFF, "Arabic Presentation Forms-A"),
-    UnicodeRange(0xFE00, 0xFE0F, "Variation Selectors"),
-    UnicodeRange(0xFE10, 0xFE1F, "Vertical Forms"),
-    UnicodeRange(0xFE20, 0xFE2F, "Combining Half Marks"),
-    UnicodeRange(0xFE30, 0xFE4F, "CJK Compatibility Forms"),
-    UnicodeRange(0xFE50, 0xFE6F, "Small Form Variants"),
-    UnicodeRange(0xFE70, 0xFEFF, "Arabic Presentation Forms-B"),
-    UnicodeRange(0xFF00, 0xFFEF, "Halfwidth and Fullwidth Forms"),
-    UnicodeRange(0xFFF0, 0xFFFF, "Specials")
-]
+# (key, begin, end, name) with keys precomputed as lowercase, non-spaced names;
+# a tuple of constants costs nothing to load, the UnicodeRange objects in
+# UnicodeBlocks and UnicodeBlocksDict are only built when first used
+UnicodeBlocksTable: tuple[tuple[str, int, int, str], ...] = (
+    ("basic_latin", 0x0000, 0x007F, "Basic Latin"),
+    ("latin_1_supplement", 0x0080, 0x00FF, "Latin-1 Supplement"),
+    ("latin_extended_a", 0x0100, 0x017F, "Latin Extended-A"),
+    ("latin_extended_b", 0x0180, 0x024F, "Latin Extended-B"),
+    ("ipa_extensions", 0x0250, 0x02AF, "IPA Extensions"),
+    ("spacing_modifier_letters", 0x02B0, 0x02FF, "Spacing Modifier Letters"),
+    ("combining_diacritical_marks", 0x0300, 0x036F, "Combining Diacritical Marks"),
+    ("greek_and_coptic", 0x0370, 0x03FF, "Greek and Coptic"),
+    ("cyrillic", 0x0400, 0x04FF, "Cyrillic"),
+    ("cyrillic_supplement", 0x0500, 0x052F, "Cyrillic Supplement"),
+    ("armenian", 0x0530, 0x058F, "Armenian"),
+    ("hebrew", 0x0590, 0x05FF, "Hebrew"),
+    ("arabic", 0x0600, 0x06FF, "Arabic"),
+    ("syriac", 0x0700, 0x074F, "Syriac"),
+    ("arabic_supplement", 0x0750, 0x077F, "Arabic Supplement"),
+    ("thaana", 0x0780, 0x07BF, "Thaana"),
+    ("nko", 0x07C0, 0x07FF, "NKo"),
+    ("samaritan", 0x0800, 0x083F, "Samaritan"),
+    ("mandaic", 0x0840, 0x085F, "Mandaic"),
+    ("syriac_supplement", 0x0860, 0x086F, "Syriac Supplement"),
+    ("arabic_extended_b", 0x0870, 0x089F, "Arabic Extended-B"),
+    ("arabic_extended_a", 0x08A0, 0x08FF, "Arabic Extended-A"),
+    ("devanagari", 0x0900, 0x097F, "Devanagari"),
+    ("bengali", 0x0980, 0x09FF, "Bengali"),
+    ("gurmukhi", 0x0A00, 0x0A7F, "Gurmukhi"),
+    ("gujarati", 0x0A80, 0x0AFF, "Gujarati"),
+    ("oriya", 0x0B00, 0x0B7F, "Oriya"),
+    ("tamil", 0x0B80, 0x0BFF, "Tamil"),
+    ("telugu", 0x0C00, 0x0C7F, "Telugu"),
+    ("kannada", 0x0C80, 0x0CFF, "Kannada"),
+    ("malayalam", 0x0D00, 0x0D7F, "Malayalam"),
+    ("sinhala", 0x0D80, 0x0DFF, "Sinhala"),
+    ("thai", 0x0E00, 0x0E7F, "Thai"),
+    ("lao", 0x0E80, 0x0EFF, "Lao"),
+    ("tibetan", 0x0F00, 0x0FFF, "Tibetan"),
+    ("myanmar", 0x1000, 0x109F, "Myanmar"),
+    ("georgian", 0x10A0, 0x10FF, "Georgian"),
+    ("hangul_jamo", 0x1100, 0x11FF, "Hangul Jamo"),
+    ("ethiopic", 0x1200, 0x137F, "Ethiopic"),
+    ("ethiopic_supplement", 0x1380, 0x139F, "Ethiopic Supplement"),
+    ("cherokee", 0x13A0, 0x13FF, "Cherokee"),
+    ("unified_canadian_aboriginal_syllabics", 0x1400, 0x167F, "Unified Canadian Aboriginal Syllabics"),
+    ("ogham", 0x1680, 0x169F, "Ogham"),
+    ("runic", 0x16A0, 0x16FF, "Runic"),
+    ("tagalog", 0x1700, 0x171F, "Tagalog"),
+    ("hanunoo", 0x1720, 0x173F, "Hanunoo"),
+    ("buhid", 0x1740, 0x175F, "Buhid"),
+    ("tagbanwa", 0x1760, 0x177F, "Tagbanwa"),
+    ("khmer", 0x1780, 0x17FF, "Khmer"),
+    ("mongolian", 0x1800, 0x18AF, "Mongolian"),
+    ("unified_canadian_aboriginal_syllabics_extended", 0x18B0, 0x18FF, "Unified Canadian Aboriginal Syllabics Extended"),
+    ("limbu", 0x1900, 0x194F, "Limbu"),
+    ("tai_le", 0x1950, 0x197F, "Tai Le"),
+    ("new_tai_lue", 0x1980, 0x19DF, "New Tai Lue"),
+    ("khmer_symbols", 0x19E0, 0x19FF, "Khmer Symbols"),
+    ("buginese", 0x1A00, 0x1A1F, "Buginese"),
+    ("tai_tham", 0x1A20, 0x1AAF, "Tai Tham"),
+    ("combining_diacritical_marks_extended", 0x1AB0, 0x1AFF, "Combining Diacritical Marks Extended"),
+    ("balinese", 0x1B00, 0x1B7F, "Balinese"),
+    ("sundanese", 0x1B80, 0x1BBF, "Sundanese"),
+    ("batak", 0x1BC0, 0x1BFF, "Batak"),
+    ("lepcha", 0x1C00, 0x1C4F, "Lepcha"),
+    ("ol_chiki", 0x1C50, 0x1C7F, "Ol Chiki"),
+    ("cyrillic_extended_c", 0x1C80, 0x1C8F, "Cyrillic Extended-C"),
+    ("georgian_extended", 0x1C90, 0x1CBF, "Georgian Extended"),
+    ("sundanese_supplement", 0x1CC0, 0x1CCF, "Sundanese Supplement"),
+    ("vedic_extensions", 0x1CD0, 0x1CFF, "Vedic Extensions"),
+    ("phonetic_extensions", 0x1D00, 0x1D7F, "Phonetic Extensions"),
+    ("phonetic_extensions_supplement", 0x1D80, 0x1DBF, "Phonetic Extensions Supplement"),
+    ("combining_diacritical_marks_supplement", 0x1DC0, 0x1DFF, "Combining Diacritical Marks Supplement"),
+    ("latin_extended_additional", 0x1E00, 0x1EFF, "Latin Extended Additional"),
+    ("greek_extended", 0x1F00, 0x1FFF, "Greek Extended"),
+    ("general_punctuation", 0x2000, 0x206F, "General Punctuation"),
+    ("superscripts_and_subscripts", 0x2070, 0x209F, "Superscripts and Subscripts"),
+    ("currency_symbols", 0x20A0, 0x20CF, "Currency Symbols"),
+    ("combining_diacritical_marks_for_symbols", 0x20D0, 0x20FF, "Combining Diacritical Marks for Symbols"),
+    ("letterlike_symbols", 0x2100, 0x214F, "Letterlike Symbols"),
+    ("number_forms", 0x2150, 0x218F, "Number Forms"),
+    ("arrows", 0x2190, 0x21FF, "Arrows"),
+    ("mathematical_operators", 0x2200, 0x22FF, "Mathematical Operators"),
+    ("miscellaneous_technical", 0x2300, 0x23FF, "Miscellaneous Technical"),
+    ("control_pictures", 0x2400, 0x243F, "Control Pictures"),
+    ("optical_character_recognition", 0x2440, 0x245F, "Optical Character Recognition"),
+    ("enclosed_alphanumerics", 0x2460, 0x24FF, "Enclosed Alphanumerics"),
+    ("box_drawing", 0x2500, 0x257F, "Box Drawing"),
+    ("block_elements", 0x2580, 0x259F, "Block Elements"),
+    ("geometric_shapes", 0x25A0, 0x25FF, "Geometric Shapes"),
+    ("miscellaneous_symbols", 0x2600, 0x26FF, "Miscellaneous Symbols"),
+    ("dingbats", 0x2700, 0x27BF, "Dingbats"),
+    ("miscellaneous_mathematical_symbols_a", 0x27C0, 0x27EF, "Miscellaneous Mathematical Symbols-A"),
+    ("supplemental_arrows_a", 0x27F0, 0x27FF, "Supplemental Arrows-A"),
+    ("braille_patterns", 0x2800, 0x28FF, "Braille Patterns"),
+    ("supplemental_arrows_b", 0x2900, 0x297F, "Supplemental Arrows-B"),
+    ("miscellaneous_mathematical_symbols_b", 0x2980, 0x29FF, "Miscellaneous Mathematical Symbols-B"),
+    ("supplemental_mathematical_operators", 0x2A00, 0x2AFF, "Supplemental Mathematical Operators"),
+    ("miscellaneous_symbols_and_arrows", 0x2B00, 0x2BFF, "Miscellaneous Symbols and Arrows"),
+    ("glagolitic", 0x2C00, 0x2C5F, "Glagolitic"),
+    ("latin_extended_c", 0x2C60, 0x2C7F, "Latin Extended-C"),
+    ("coptic", 0x2C80, 0x2CFF, "Coptic"),
+    ("georgian_supplement", 0x2D00, 0x2D2F, "Georgian Supplement"),
+    ("tifinagh", 0x2D30, 0x2D7F, "Tifinagh"),
+    ("ethiopic_extended", 0x2D80, 0x2DDF, "Ethiopic Extended"),
+    ("cyrillic_extended_a", 0x2DE0, 0x2DFF, "Cyrillic Extended-A"),
+    ("supplemental_punctuation", 0x2E00, 0x2E7F, "Supplemental Punctuation"),
+    ("cjk_radicals_supplement", 0x2E80, 0x2EFF, "CJK Radicals Supplement"),
+    ("kangxi_radicals", 0x2F00, 0x2FDF, "Kangxi Radicals"),
+    ("ideographic_description_characters", 0x2FF0, 0x2FFF, "Ideographic Description Characters"),
+    ("cjk_symbols_and_punctuation", 0x3000, 0x303F, "CJK Symbols and Punctuation"),
+    ("hiragana", 0x3040, 0x309F, "Hiragana"),
+    ("katakana", 0x30A0, 0x30FF, "Katakana"),
+    ("bopomofo", 0x3100, 0x312F, "Bopomofo"),
+    ("hangul_compatibility_jamo", 0x3130, 0x318F, "Hangul Compatibility Jamo"),
+    ("kanbun", 0x3190, 0x319F, "Kanbun"),
+    ("bopomofo_extended", 0x31A0, 0x31BF, "Bopomofo Extended"),
+    ("cjk_strokes", 0x31C0, 0x31EF, "CJK Strokes"),
+    ("katakana_phonetic_extensions", 0x31F0, 0x31FF, "Katakana Phonetic Extensions"),
+    ("enclosed_cjk_letters_and_months", 0x3200, 0x32FF, "Enclosed CJK Letters and Months"),
+    ("cjk_compatibility", 0x3300, 0x33FF, "CJK Compatibility"),
+    ("cjk_unified_ideographs_extension_a", 0x3400, 0x4DBF, "CJK Unified Ideographs Extension A"),
+    ("yijing_hexagram_symbols", 0x4DC0, 0x4DFF, "Yijing Hexagram Symbols"),
+    ("cjk_unified_ideographs", 0x4E00, 0x9FFF, "CJK Unified Ideographs"),
+    ("yi_syllables", 0xA000, 0xA48F, "Yi Syllables"),
+    ("yi_radicals", 0xA490, 0xA4CF, "Yi Radicals"),
+    ("lisu", 0xA4D0, 0xA4FF, "Lisu"),
+    ("vai", 0xA500, 0xA63F, "Vai"),
+    ("cyrillic_extended_b", 0xA640, 0xA69F, "Cyrillic Extended-B"),
+    ("bamum", 0xA6A0, 0xA6FF, "Bamum"),
+    ("modifier_tone_letters", 0xA700, 0xA71F, "Modifier Tone Letters"),
+    ("latin_extended_d", 0xA720, 0xA7FF, "Latin Extended-D"),
+    ("syloti_nagri", 0xA800, 0xA82F, "Syloti Nagri"),
+    ("common_indic_number_forms", 0xA830, 0xA83F, "Common Indic Number Forms"),
+    ("phags_pa", 0xA840, 0xA87F, "Phags-pa"),
+    ("saurashtra", 0xA880, 0xA8DF, "Saurashtra"),
+    ("devanagari_extended", 0xA8E0, 0xA8FF, "Devanagari Extended"),
+    ("kayah_li", 0xA900, 0xA92F, "Kayah Li"),
+    ("rejang", 0xA930, 0xA95F, "Rejang"),
+    ("hangul_jamo_extended_a", 0xA960, 0xA97F, "Hangul Jamo Extended-A"),
+    ("javanese", 0xA980, 0xA9DF, "Javanese"),
+    ("myanmar_extended_b", 0xA9E0, 0xA9FF, "Myanmar Extended-B"),
+    ("cham", 0xAA00, 0xAA5F, "Cham"),
+    ("myanmar_extended_a", 0xAA60, 0xAA7F, "Myanmar Extended-A"),
+    ("tai_viet", 0xAA80, 0xAADF, "Tai Viet"),
+    ("meetei_mayek_extensions", 0xAAE0, 0xAAFF, "Meetei Mayek Extensions"),
+    ("ethiopic_extended_a", 0xAB00, 0xAB2F, "Ethiopic Extended-A"),
+    ("latin_extended_e", 0xAB30, 0xAB6F, "Latin Extended-E"),
+    ("cherokee_supplement", 0xAB70, 0xABBF, "Cherokee Supplement"),
+    ("meetei_mayek", 0xABC0, 0xABFF, "Meetei Mayek"),
+    ("hangul_syllables", 0xAC00, 0xD7AF, "Hangul Syllables"),
+    ("hangul_jamo_extended_b", 0xD7B0, 0xD7FF, "Hangul Jamo Extended-B"),
+    ("high_surrogates", 0xD800, 0xDB7F, "High Surrogates"),
+    ("high_private_use_surrogates", 0xDB80, 0xDBFF, "High Private Use Surrogates"),
+    ("low_surrogates", 0xDC00, 0xDFFF, "Low Surrogates"),
+    ("private_use_area", 0xE000, 0xF8FF, "Private Use Area"),
+    ("cjk_compatibility_ideographs", 0xF900, 0xFAFF, "CJK Compatibility Ideographs"),
+    ("alphabetic_presentation_forms", 0xFB00, 0xFB4F, "Alphabetic Presentation Forms"),
+    ("arabic_presentation_forms_a", 0xFB50, 0xFDFF, "Arabic Presentation Forms-A"),
+    ("variation_selectors", 0xFE00, 0xFE0F, "Variation Selectors"),
+    ("vertical_forms", 0xFE10, 0xFE1F, "Vertical Forms"),
+    ("combining_half_marks", 0xFE20, 0xFE2F, "Combining Half Marks"),
+    ("cjk_compatibility_forms", 0xFE30, 0xFE4F, "CJK Compatibility Forms"),
+    ("small_form_variants", 0xFE50, 0xFE6F, "Small Form Variants"),
+    ("arabic_presentation_forms_b", 0xFE70, 0xFEFF, "Arabic Presentation Forms-B"),
+    ("halfwidth_and_fullwidth_forms", 0xFF00, 0xFFEF, "Halfwidth and Fullwidth Forms"),
+    ("specials", 0xFFF0, 0xFFFF, "Specials"),
+)
+
+# keys of UnicodeBlocksDict, without building it
+UnicodeBlockKeys: tuple[str, ...] = tuple(k for k, b, e, n in UnicodeBlocksTable)
 
-# dictionary with lowercase, non-spaced names as keys
-UnicodeBlocksDict = {r.name.lower().replace(" ", "_").replace("-", "_"): r for r in UnicodeBlocks}
+# UnicodeBlocks (list of UnicodeRange) and UnicodeBlocksDict (same, with
+# lowercase, non-spaced names as keys) are built on first access
+def __getattr__(name: str):
+    global UnicodeBlocks, UnicodeBlocksDict
+    if name == "UnicodeBlocks":
+        UnicodeBlocks = [UnicodeRange(b, e, n) for k, b, e, n in UnicodeBlocksTable]
+        return UnicodeBlocks
+    if name == "UnicodeBlocksDict":
+        UnicodeBlocksDict = {k: UnicodeRange(b, e, n) for k, b, e, n in UnicodeBlocksTable}
+        return UnicodeBlocksDict
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,43 +1,170 @@
-from io import BufferedIOBase, RawIOBase
-from typing import Union
+from io import BufferedIOBase, BytesIO, RawIOBase
+from struct import Struct
+from typing import TYPE_CHECKING, Iterable, Optional, Union
 import Glyph
+from GlyphTable import GlyphTable
+
+if TYPE_CHECKING:
+    from VlwReader import VlwReader
 
 AnyIOBase = Union[BufferedIOBase, RawIOBase]
 
+# font header: glyph count, version, size, deprecated, ascent, descent
+# all big-endian signed 32-bit ints
+FontHeaderStruct = Struct(">6i")
+
 class VlwFont:
     height: int # line height
     ascent: int # positive int, how high characters extend above baseline
     descent: int  # positive(?) int, how high characters extend below baseline
-    glyphs: list[Glyph.Glyph] # inserter is responsible for maintaining sorted state
+    glyphs: GlyphTable # kept sorted by codepoint (a sorted list[Glyph] also works)
     name: str # name of font
     psname: str # postscript name of font (why?)
     aa: bool # glyphs are antialiased?
+    # 256-byte table every bitmap byte is mapped through as it's written
+    # (e.g. for gamma), applied to whole runs of bitmaps with bytes.translate;
+    # glyph bitmaps themselves are never changed, so they can be shared
+    bitmap_lut: Optional[bytes] = None
+    
+    COPY_CHUNK = 1 << 20 # bytes of spooled bitmaps translated at once
     
     # write VLW file to stream
+    # whole glyph table and bitmap arena are each written in one go
     def write_stream(self, io: AnyIOBase):
-        io.write(len(self.glyphs).to_bytes(4, byteorder="big", signed=True)) # glyphCount
-        io.write((11).to_bytes(4, byteorder="big", signed=True))             # version
-        io.write(self.height.to_bytes(4, byteorder="big", signed=True))      # size
-        io.write((0).to_bytes(4, byteorder="big", signed=True))              # deprecated
-        io.write(self.ascent.to_bytes(4, byteorder="big", signed=True))      # ascent
-        io.write(self.descent.to_bytes(4, byteorder="big", signed=True))     # descent
-
-        for g in self.glyphs:
-            g.write_header(io)
-
-        for g in self.glyphs:
-            g.write_bitmap(io)
+        glyphs = self.glyphs
+        if not isinstance(glyphs, GlyphTable):
+            glyphs = GlyphTable(glyphs)
+        
+        header = bytearray(FontHeaderStruct.size)
+        self._pack_header_into(header, len(glyphs))
+        
+        io.write(header)
+        io.write(glyphs.pack_headers())
+        io.write(self._map_bitmaps(glyphs.bitmap_arena()))
+        
+        self._write_footer(io)
+    
+    # write VLW file to stream, taking glyphs from an iterable (e.g. generator)
+    # instead of self.glyphs; glyphs must arrive sorted by codepoint
+    # glyph count and all glyph headers come before the first bitmap, so
+    # headers are collected in memory (28 bytes per glyph) and bitmaps are
+    # spooled to a temporary file once they exceed spool_max_size bytes,
+    # then both are copied to io once the last glyph has been seen
+    # output is identical to write_stream with the same glyphs
+    def write_glyph_stream(self, io: AnyIOBase, glyphs: Iterable[Glyph.Glyph], spool_max_size: int = 16 << 20):
+        # both are slow to import and only needed here
+        from shutil import copyfileobj
+        from tempfile import SpooledTemporaryFile
+        
+        glyph_count = 0
+        headers = BytesIO()
+        
+        with SpooledTemporaryFile(max_size=spool_max_size) as bitmaps:
+            for g in glyphs:
+                g.write_header(headers)
+                g.write_bitmap(bitmaps)
+                glyph_count += 1
+            
+            header = bytearray(FontHeaderStruct.size)
+            self._pack_header_into(header, glyph_count)
+            io.write(header)
+            io.write(headers.getbuffer())
+            
+            bitmaps.seek(0)
+            if self.bitmap_lut is None:
+                copyfileobj(bitmaps, io)
+            else:
+                while True:
+                    chunk = bitmaps.read(VlwFont.COPY_CHUNK)
+                    if not chunk:
+                        break
+                    io.write(chunk.translate(self.bitmap_lut))
+        
+        self._write_footer(io)
+    
+    # write VLW file to stream, made of the glyphs at rows keep (sorted) of an
+    # existing font base merged with new glyphs (whose codepoints base lacks)
+    # records and bitmaps of kept glyphs are copied from base as raw bytes,
+    # with runs of consecutive kept glyphs copied as one slice (bitmap_lut
+    # only applies to new glyphs, base's bitmaps were mapped when written)
+    def write_patched_stream(self, io: AnyIOBase, base: "VlwReader", keep: list[int], glyphs: GlyphTable):
+        header_size = Glyph.HeaderStruct.size
+        new_headers = memoryview(glyphs.pack_headers()).cast("B")
+        new_codepoints = glyphs.codepoints
+        new_bitmaps = memoryview(self._map_bitmaps(glyphs.bitmap_arena()))
+        new_offset = 0
         
+        records: list[memoryview] = []
+        bitmaps: list[memoryview] = []
+        run_begin = run_end = 0 # run of kept base rows not yet added
+        
+        def flush_run():
+            if run_end > run_begin:
+                records.append(base.records(run_begin, run_end))
+                bitmaps.append(base.bitmaps(run_begin, run_end))
+        
+        i = j = 0
+        while i < len(keep) or j < len(new_codepoints):
+            if j == len(new_codepoints) or (i < len(keep) and base.codepoints[keep[i]] < new_codepoints[j]):
+                if keep[i] != run_end:
+                    flush_run()
+                    run_begin = keep[i]
+                run_end = keep[i] + 1
+                i += 1
+            else:
+                flush_run()
+                run_begin = run_end = 0
+                records.append(new_headers[j*header_size:(j+1)*header_size])
+                length = len(glyphs[j].bitmap_buf)
+                bitmaps.append(new_bitmaps[new_offset:new_offset+length])
+                new_offset += length
+                j += 1
+        flush_run()
+        
+        header = bytearray(FontHeaderStruct.size)
+        self._pack_header_into(header, len(keep) + len(glyphs))
+        
+        io.write(header)
+        io.writelines(records)
+        io.writelines(bitmaps)
+        
+        self._write_footer(io)
+    
+    # size in bytes of the VLW file for glyph_count glyphs with bitmap_size
+    # bytes of bitmaps in total, as write_stream would write it
+    def stream_size(self, glyph_count: int, bitmap_size: int) -> int:
+        return (FontHeaderStruct.size + Glyph.HeaderStruct.size * glyph_count + bitmap_size +
+            2 + len(self.name.encode("utf-8")) + 2 + len(self.psname.encode("utf-8")) + 1)
+    
+    # bitmaps mapped through bitmap_lut in one pass (unchanged without one)
+    def _map_bitmaps(self, bitmaps: memoryview) -> Union[bytes, memoryview]:
+        if self.bitmap_lut is None:
+            return bitmaps
+        return bitmaps.tobytes().translate(self.bitmap_lut)
+    
+    # pack font header (everything before glyph headers) into buf at offset 0
+    def _pack_header_into(self, buf: bytearray, glyph_count: int):
+        FontHeaderStruct.pack_into(buf, 0,
+            glyph_count,  # glyphCount
+            11,           # version
+            self.height,  # size
+            0,            # deprecated
+            self.ascent,  # ascent
+            self.descent) # descent
+    
+    # write font footer (everything after glyph bitmaps)
+    def _write_footer(self, io: AnyIOBase):
         # Bodmer got string encoding wrong.
         # Actual is 2-byte length, then non-terminated string)
         # ref: https://github.com/openjdk-mirror/jdk7u-jdk/blob/f4d80957e89a19a29bb9f9807d2a28351ed7f7df/src/share/classes/java/io/DataOutputStream.java#L346
         name_utf = self.name.encode("utf-8")
-        io.write(len(name_utf).to_bytes(2, byteorder="big", signed=False))
-        io.write(name_utf)
-        
         psname_utf = self.psname.encode("utf-8")
-        io.write(len(psname_utf).to_bytes(2, byteorder="big", signed=False))
-        io.write(psname_utf)
-        
         aa_int = 1 if self.aa else 0
-        io.write(aa_int.to_bytes(1, byteorder="big", signed=False))
+        
+        io.write(b"".join([
+            len(name_utf).to_bytes(2, byteorder="big", signed=False),
+            name_utf,
+            len(psname_utf).to_bytes(2, byteorder="big", signed=False),
+            psname_utf,
+            aa_int.to_bytes(1, byteorder="big", signed=False)
+        ]))
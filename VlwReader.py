@@ -0,0 +1,231 @@
+import mmap
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from operator import mul
+from sys import byteorder
+from typing import Optional, Union
+from Glyph import Glyph, HeaderStruct
+from UnicodeRange import UnicodeRangeSet
+from VlwFont import FontHeaderStruct
+
+# reads an existing VLW file (as written by VlwFont) without copying it
+# header fields and the glyph table are parsed up front; raw glyph records
+# and bitmaps are returned as memoryview slices of the underlying buffer
+# glyphs are looked up by codepoint with a binary search, as VLW keeps
+# them sorted (files that aren't are searched linearly)
+class VlwReader:
+    glyph_count: int
+    version: int
+    height: int # line height
+    ascent: int
+    descent: int
+    name: str
+    psname: str
+    aa: bool
+    codepoints: array # 'i' codepoint of each glyph, in file order (sorted)
+    widths: array # 'i' bitmap width of each glyph
+    heights: array # 'i' bitmap height of each glyph
+    advances: array # 'i' cursor advance of each glyph
+    bearings_y: array # 'i' top bearing of each glyph
+    bearings_x: array # 'i' left bearing of each glyph
+    bitmap_offsets: array # 'q' offset of each glyph's bitmap in buffer, plus one past the last
+    
+    _buf: memoryview
+    _mmap: Optional[mmap.mmap]
+    _sorted: bool # whether codepoints are sorted, so find can bisect
+    
+    def __init__(self, buf: Union[bytes, bytearray, memoryview, mmap.mmap]):
+        self._buf = memoryview(buf)
+        self._mmap = None
+        
+        try:
+            self._parse()
+        except:
+            self._buf.release()
+            raise
+    
+    def _parse(self):
+        if len(self._buf) < FontHeaderStruct.size:
+            raise ValueError("File too short to be a VLW font", len(self._buf))
+        (self.glyph_count, self.version, self.height, _,
+            self.ascent, self.descent) = FontHeaderStruct.unpack_from(self._buf, 0)
+        if self.glyph_count < 0:
+            raise ValueError("Negative glyph count, not a VLW font", self.glyph_count)
+        
+        table_end = self.table_offset + HeaderStruct.size * self.glyph_count
+        if len(self._buf) < table_end:
+            raise ValueError("Glyph table extends past end of file", table_end, len(self._buf))
+        
+        # decode whole table at once, then take columns out of it
+        fields = HeaderStruct.size // 4
+        table = array("i")
+        table.frombytes(self._buf[self.table_offset:table_end])
+        if byteorder == "little":
+            table.byteswap() # VLW is big-endian
+        self.codepoints = table[0::fields]
+        self.heights = table[1::fields]
+        self.widths = table[2::fields]
+        self.advances = table[3::fields]
+        self.bearings_y = table[4::fields]
+        self.bearings_x = table[5::fields]
+        c = self.codepoints
+        self._sorted = all(map(int.__lt__, c, c[1:]))
+        
+        self.bitmap_offsets = array("q", accumulate(map(mul, self.widths, self.heights), initial=table_end))
+        
+        # footer: 2-byte length + name, 2-byte length + psname, 1-byte aa
+        off = self.bitmap_offsets[-1]
+        self.name, off = self._read_string(off)
+        self.psname, off = self._read_string(off)
+        if len(self._buf) < off + 1:
+            raise ValueError("File ends before antialiasing flag")
+        self.aa = self._buf[off] != 0
+    
+    # open and memory-map VLW file; close it (or use with) when done
+    @staticmethod
+    def open(file_path: str):
+        with open(file_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            reader = VlwReader(mm)
+        except:
+            mm.close()
+            raise
+        reader._mmap = mm
+        return reader
+    
+    # glyphs and views taken from the reader keep the mapping alive: if any
+    # are still referenced, it's unmapped once the last of them is released
+    # instead (never raises BufferError, which could hide the exception
+    # that ended a with block)
+    def close(self):
+        self._buf.release()
+        mm, self._mmap = self._mmap, None
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                pass # exported views hold the only references to mm now
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self) -> int:
+        return self.glyph_count
+    
+    # glyph i, with bitmap_buf a memoryview into the file (not a copy)
+    # drop glyphs (and other views) before closing the reader
+    def __getitem__(self, i: int) -> Glyph:
+        if i < 0:
+            i += self.glyph_count
+        if i < 0 or i >= self.glyph_count:
+            raise IndexError("glyph index out of range", i)
+        
+        g = Glyph()
+        g.codepoint = self.codepoints[i]
+        g.bitmap_height = self.heights[i]
+        g.bitmap_width = self.widths[i]
+        g.advance = self.advances[i]
+        g.bearing_y = self.bearings_y[i]
+        g.bearing_x = self.bearings_x[i]
+        g.bitmap_buf = self.bitmaps(i, i + 1)
+        return g
+    
+    def __contains__(self, codepoint: int) -> bool:
+        return self.find(codepoint) is not None
+    
+    # index of glyph for codepoint, or None if font doesn't have it
+    def find(self, codepoint: int) -> Optional[int]:
+        if not self._sorted:
+            try:
+                return self.codepoints.index(codepoint)
+            except ValueError:
+                return None
+        
+        i = bisect_left(self.codepoints, codepoint)
+        if i < self.glyph_count and self.codepoints[i] == codepoint:
+            return i
+        return None
+    
+    # glyph for codepoint, or None if font doesn't have it
+    def get(self, codepoint: int) -> Optional[Glyph]:
+        i = self.find(codepoint)
+        return None if i is None else self[i]
+    
+    # all codepoints in font
+    def coverage(self) -> UnicodeRangeSet:
+        return UnicodeRangeSet.from_codepoints(self.codepoints)
+    
+    # number of glyphs with codepoints in begin..end (inclusive)
+    def count_in(self, begin: int, end: int) -> int:
+        if not self._sorted:
+            return sum(1 for c in self.codepoints if begin <= c <= end)
+        return bisect_left(self.codepoints, end + 1) - bisect_left(self.codepoints, begin)
+    
+    # text drawn on one line as the font would draw it, returned as a Glyph
+    # (codepoint 0) whose bitmap covers the whole line, from the top of the
+    # line (or of any glyph reaching above it) down; chars the font lacks are
+    # skipped, overlapping glyphs keep the brighter pixel
+    def render_text(self, text: str) -> Glyph:
+        placed: list[tuple[Glyph, int, int]] = [] # glyph, left, top
+        pen = 0
+        left = top = 0
+        right = 0
+        bottom = self.height
+        for ch in text:
+            g = self.get(ord(ch))
+            if g is None:
+                continue
+            x = pen + g.bearing_x
+            y = self.ascent - g.bearing_y
+            placed.append((g, x, y))
+            left = min(left, x)
+            top = min(top, y)
+            right = max(right, x + g.bitmap_width)
+            bottom = max(bottom, y + g.bitmap_height)
+            pen += g.advance
+        right = max(right, pen)
+        
+        out = Glyph()
+        out.codepoint = 0
+        out.bitmap_width = right - left
+        out.bitmap_height = bottom - top
+        out.advance = pen
+        out.bearing_y = self.ascent - top
+        out.bearing_x = left
+        out.bitmap_buf = bytearray(out.bitmap_width * out.bitmap_height)
+        
+        for g, x, y in placed:
+            for row in range(0, g.bitmap_height):
+                src = g.bitmap_buf[row*g.bitmap_width:(row+1)*g.bitmap_width]
+                off = (y - top + row) * out.bitmap_width + x - left
+                dst = out.bitmap_buf[off:off+g.bitmap_width]
+                out.bitmap_buf[off:off+g.bitmap_width] = bytes(map(max, src, dst))
+        
+        return out
+    
+    # offset of glyph table in file
+    @property
+    def table_offset(self) -> int:
+        return FontHeaderStruct.size
+    
+    # raw glyph table records of glyphs begin..end-1 (HeaderStruct.size bytes each)
+    def records(self, begin: int, end: int) -> memoryview:
+        return self._buf[self.table_offset + HeaderStruct.size * begin:self.table_offset + HeaderStruct.size * end]
+    
+    # raw bitmaps of glyphs begin..end-1, contiguous in file
+    def bitmaps(self, begin: int, end: int) -> memoryview:
+        return self._buf[self.bitmap_offsets[begin]:self.bitmap_offsets[end]]
+    
+    def _read_string(self, off: int) -> tuple[str, int]:
+        if len(self._buf) < off + 2:
+            raise ValueError("File ends before font name")
+        length = int.from_bytes(self._buf[off:off+2], byteorder="big", signed=False)
+        off += 2
+        if len(self._buf) < off + length:
+            raise ValueError("File ends inside font name")
+        return bytes(self._buf[off:off+length]).decode("utf-8"), off + length
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import signal
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os import path, remove, stat
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+import vlwconv
+from ConvertRequest import ConvertRequest
+
+if TYPE_CHECKING:
+    import freetype
+
+log = logging.getLogger("vlwconv")
+
+# faces each worker process keeps open, most recently used last, keyed by
+# (real path, mtime, face index) so a font file changed on disk is reopened
+_worker_faces: "OrderedDict[tuple[str, int, int], freetype.Face]" = OrderedDict()
+_worker_max_faces = 16
+
+def _init_worker(max_faces: int):
+    global _worker_max_faces
+    _worker_max_faces = max_faces
+
+def _worker_face(font_path: str, ttc_index: int) -> "freetype.Face":
+    real_path = path.realpath(font_path)
+    key = (real_path, stat(real_path).st_mtime_ns, ttc_index)
+    
+    face = _worker_faces.get(key)
+    if face is not None:
+        _worker_faces.move_to_end(key)
+        return face
+    
+    # drop faces opened from an older version of the file
+    for k in [k for k in _worker_faces if k[0] == real_path and k[2] == ttc_index]:
+        del _worker_faces[k]
+    
+    face = _worker_faces[key] = vlwconv.load_face(real_path, ttc_index)
+    while len(_worker_faces) > _worker_max_faces:
+        _worker_faces.popitem(last=False)
+    
+    return face
+
+# run one conversion request in a worker process, returns the response
+def _convert_request(request: ConvertRequest) -> dict:
+    return request.run(_worker_face)
+
+# conversion server: reads one JSON request per line and answers each with
+# one JSON response line, from a Unix socket or stdin/stdout
+# requests are ConvertRequest dicts plus an "id", e.g.
+#   {"id": 1, "font": "font.ttf", "sizes": [12, 16], "blocks": ["basic_latin"]}
+# and are answered (possibly out of order, match them by "id") with the
+# response of ConvertRequest.run plus the id, e.g.
+#   {"id": 1, "ok": true, "glyphs": 95, "missing": 0, "fonts": [{"size": 12, "vlw": "<base64>"}, ...]}
+# failed requests get {"id": 1, "ok": false, "error": "..."}
+# conversions run on a pool of jobs worker processes, each keeping up to
+# max_faces faces open between requests; at most jobs * QUEUE_PER_JOB
+# requests are converted or queued at once (over all connections), further
+# requests wait until one finishes
+class VlwServer:
+    QUEUE_PER_JOB = 2
+    LINE_LIMIT = 16 << 20 # longest request line accepted
+    
+    _jobs: int
+    _max_faces: int
+    _pool: ProcessPoolExecutor
+    _slots: asyncio.Semaphore
+    
+    def __init__(self, jobs: int = 1, max_faces: int = 16):
+        self._jobs = vlwconv.resolve_jobs(jobs)
+        self._max_faces = max_faces
+        self._pool = self._make_pool()
+        self._slots = asyncio.Semaphore(self._jobs * VlwServer.QUEUE_PER_JOB)
+    
+    def _make_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._jobs, initializer=_init_worker, initargs=(self._max_faces,))
+    
+    def close(self):
+        self._pool.shutdown()
+    
+    # answer one request line, never raises for bad requests
+    async def handle(self, line: bytes) -> bytes:
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get("id")
+            request = ConvertRequest.from_dict({k: v for k, v in request.items() if k != "id"})
+            
+            pool = self._pool
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(pool, _convert_request, request)
+            except BrokenProcessPool:
+                # a worker died (e.g. crashed in FreeType), start over with a fresh pool
+                if pool is self._pool:
+                    self._pool = self._make_pool()
+                raise Exception("Worker process died")
+        except Exception as e:
+            log.warning("Request {} failed: {}".format(request_id, e))
+            response = {"ok": False, "error": str(e)}
+        
+        return json.dumps(dict(id=request_id, **response)).encode("utf-8") + b"\n"
+    
+    # handle requests read by readline (returns b"" at end of input)
+    # concurrently, passing each response to send
+    async def _serve(self, readline: Callable[[], Awaitable[bytes]], send: Callable[[bytes], Awaitable[None]]):
+        async def run(line: bytes):
+            try:
+                await send(await self.handle(line))
+            finally:
+                self._slots.release()
+        
+        # a slot is only taken once a whole request line has arrived, so idle
+        # connections don't hold any; while all slots are busy, this
+        # connection's next line isn't read
+        tasks = set()
+        while True:
+            line = await readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            
+            await self._slots.acquire()
+            task = asyncio.ensure_future(run(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        
+        if tasks:
+            await asyncio.wait(tasks)
+    
+    # serve stdin/stdout until end of input
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        
+        # stdin may be a file or terminal, which can't be read asynchronously,
+        # so lines are read in a thread
+        async def readline() -> bytes:
+            return await loop.run_in_executor(None, sys.stdin.buffer.readline, VlwServer.LINE_LIMIT)
+        
+        async def send(data: bytes):
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        
+        await self._serve(readline, send)
+    
+    # serve connections on a Unix socket at socket_path until SIGINT/SIGTERM
+    async def serve_unix(self, socket_path: str):
+        async def connected(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            lock = asyncio.Lock()
+            
+            async def send(data: bytes):
+                async with lock:
+                    writer.write(data)
+                    await writer.drain()
+            
+            try:
+                await self._serve(reader.readline, send)
+            except (ConnectionError, ValueError) as e:
+                log.warning("Connection dropped: {}".format(e))
+            finally:
+                writer.close()
+        
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        
+        server = await asyncio.start_unix_server(connected, socket_path, limit=VlwServer.LINE_LIMIT)
+        log.info("Listening on \"{}\".".format(socket_path))
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if path.exists(socket_path):
+                remove(socket_path)
@@ -0,0 +1,243 @@
+# benchmark - times each stage of the vlwconv pipeline separately
+# over a matrix of sizes and charsets, writes results as JSON and
+# optionally compares them against a saved baseline
+
+# Usage:
+#   python benchmark.py --font DejaVuSans.ttf --output results.json
+#   python benchmark.py --font DejaVuSans.ttf --baseline results.json
+# Any OFL/free font works; charsets the font doesn't cover simply render
+# fewer glyphs (glyph counts are recorded, and compared, alongside times).
+
+import json
+import platform
+import sys
+from hashlib import sha256
+from io import BytesIO
+from os import path
+from time import perf_counter
+from typing import Callable, Optional
+
+import vlwconv
+from GlyphTable import GlyphTable
+
+DEFAULT_SIZES = [8, 12, 16, 24, 32, 48, 72]
+
+# name -> list of UnicodeBlocksDict keys
+DEFAULT_CHARSETS = {
+    "basic_latin": ["basic_latin"],
+    "latin_greek_cyrillic": ["basic_latin", "latin_1_supplement", "latin_extended_a", "greek_and_coptic", "cyrillic"],
+    "hangul_syllables": ["hangul_syllables"],
+}
+
+# fonts tried, in order, when --font isn't given
+DEFAULT_FONTS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+STAGES = ["face_load", "gen_charlist", "glyph_index", "load_glyph", "bitmap_copy", "render", "write_stream", "write_glyph_stream"]
+
+# fastest of repeat runs of fn, in seconds
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(0, repeat):
+        t = perf_counter()
+        fn()
+        best = min(best, perf_counter() - t)
+    return best
+
+def file_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return sha256(f.read()).hexdigest()
+
+# time every stage for one font, size and charset
+def bench_one(font_file: str, ttc_index: int, size: int, blocks: list[str], repeat: int) -> dict:
+    import freetype
+    
+    stages: dict[str, float] = {}
+    
+    stages["face_load"] = best_time(lambda: vlwconv.load_face(font_file, ttc_index), repeat)
+    face = vlwconv.load_face(font_file, ttc_index)
+    
+    stages["gen_charlist"] = best_time(lambda: vlwconv.gen_charset(blocks), repeat)
+    charset = vlwconv.gen_charset(blocks)
+    
+    stages["glyph_index"] = best_time(lambda: vlwconv.face_charmap(face, charset), repeat)
+    charmap = vlwconv.face_charmap(face, charset)
+    
+    # the two halves of rendering a glyph, as render_glyphs does them: they
+    # alternate per glyph, so they are timed per call and summed; the
+    # fastest total of repeat runs is kept for each
+    vlw = vlwconv.font_info(face, size)
+    stages["load_glyph"] = stages["bitmap_copy"] = float("inf")
+    for _ in range(0, repeat):
+        load_total = copy_total = 0.0
+        for c, idx in charmap:
+            t0 = perf_counter()
+            face.load_glyph(idx, freetype.FT_LOAD_RENDER)
+            t1 = perf_counter()
+            vlwconv.bitmap_bytes(face.glyph.bitmap)
+            t2 = perf_counter()
+            
+            load_total += t1 - t0
+            copy_total += t2 - t1
+        stages["load_glyph"] = min(stages["load_glyph"], load_total)
+        stages["bitmap_copy"] = min(stages["bitmap_copy"], copy_total)
+    
+    # the same calls the command line makes: glyphs rendered (and bitmaps
+    # copied) by iter_font_glyphs, then streamed out by write_glyph_stream
+    # (write_stream is what convert()'s fonts are written with)
+    stages["render"] = best_time(lambda: list(vlwconv.iter_font_glyphs(face, size, charmap)), repeat)
+    glyphs = list(vlwconv.iter_font_glyphs(face, size, charmap))
+    
+    vlw.glyphs = GlyphTable(glyphs)
+    stages["write_stream"] = best_time(lambda: vlw.write_stream(BytesIO()), repeat)
+    
+    out = BytesIO()
+    vlw.write_glyph_stream(out, glyphs)
+    stages["write_glyph_stream"] = best_time(lambda: vlw.write_glyph_stream(BytesIO(), glyphs), repeat)
+    
+    return {
+        "glyphs": len(glyphs),
+        "bitmap_bytes": sum(len(g.bitmap_buf) for g in glyphs),
+        "output_bytes": len(out.getvalue()),
+        "stages": stages,
+    }
+
+def run(font_file: str, ttc_index: int, sizes: list[int], charsets: dict[str, list[str]], repeat: int) -> dict:
+    import freetype
+    
+    results = []
+    for name, blocks in charsets.items():
+        for size in sizes:
+            r = bench_one(font_file, ttc_index, size, blocks, repeat)
+            r["charset"] = name
+            r["size"] = size
+            results.append(r)
+            print ("{:>22} {:>3}px {:>6} glyphs  {}".format(name, size, r["glyphs"],
+                "  ".join("{}={:.4f}s".format(k, r["stages"][k]) for k in STAGES)))
+    
+    return {
+        "meta": {
+            "font": path.basename(font_file),
+            "font_sha256": file_hash(font_file),
+            "ttc_index": ttc_index,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "freetype": ".".join(str(v) for v in freetype.version()),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+# compare results against baseline, print changes beyond threshold
+# (a ratio, e.g. 0.1 for 10%); stages faster than min_time seconds in both
+# runs are too noisy to judge and skipped
+# returns number of regressions
+def compare(results: dict, baseline: dict, threshold: float, min_time: float) -> int:
+    if results["meta"]["font_sha256"] != baseline["meta"]["font_sha256"]:
+        print ("Warning: baseline was measured with a different font ({}).".format(baseline["meta"]["font"]))
+    
+    base_by_key = {(r["charset"], r["size"]): r for r in baseline["results"]}
+    regressions = 0
+    for r in results["results"]:
+        b = base_by_key.get((r["charset"], r["size"]))
+        if b is None:
+            continue
+        label = "{} {}px".format(r["charset"], r["size"])
+        
+        if r["glyphs"] != b["glyphs"] or r["output_bytes"] != b["output_bytes"]:
+            print ("{}: output changed ({} -> {} glyphs, {} -> {} bytes)".format(label,
+                b["glyphs"], r["glyphs"], b["output_bytes"], r["output_bytes"]))
+        
+        for stage in STAGES:
+            now = r["stages"][stage]
+            then = b["stages"].get(stage)
+            if then is None or max(now, then) < min_time:
+                continue
+            change = (now - then) / then if then > 0 else float("inf")
+            if change > threshold:
+                regressions += 1
+                print ("{} {}: SLOWER {:.4f}s -> {:.4f}s ({:+.0%})".format(label, stage, then, now, change))
+            elif change < -threshold:
+                print ("{} {}: faster {:.4f}s -> {:.4f}s ({:+.0%})".format(label, stage, then, now, change))
+    
+    return regressions
+
+def find_default_font() -> Optional[str]:
+    for f in DEFAULT_FONTS:
+        if path.isfile(f):
+            return f
+    return None
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog = "benchmark",
+        description = "Times each stage of the vlwconv pipeline over a matrix of sizes and charsets."
+    )
+    parser.add_argument("-f", "--font", dest="FONT",
+        default=None,
+        help="Font to benchmark with (default: first of a few common system fonts found)"
+    )
+    parser.add_argument("-t", "--ttc-index", dest="TTC_INDEX",
+        type=int, default=0,
+        help="Index of desired face in TTC font."
+    )
+    parser.add_argument("-s", "--size", dest="SIZES", action="extend",
+        type=vlwconv.parse_sizes, default=None, metavar="SIZE[,SIZE...]",
+        help="Sizes to benchmark (default {})".format(",".join(str(s) for s in DEFAULT_SIZES))
+    )
+    parser.add_argument("-c", "--charset", dest="CHARSETS", action="append",
+        choices=DEFAULT_CHARSETS.keys(), default=None,
+        help="Charsets to benchmark (can use multiple times, default all)"
+    )
+    parser.add_argument("-n", "--repeat", dest="REPEAT",
+        type=int, default=3,
+        help="Runs per measurement, fastest is kept (default 3)"
+    )
+    parser.add_argument("-o", "--output", dest="OUTPUT",
+        default=None,
+        help="Write results to this JSON file"
+    )
+    parser.add_argument("-b", "--baseline", dest="BASELINE",
+        default=None,
+        help="Compare results against this JSON file from an earlier run; exits with status 1 on regressions"
+    )
+    parser.add_argument("--threshold", dest="THRESHOLD",
+        type=float, default=10.0, metavar="PERCENT",
+        help="Change in stage time reported as faster/slower (default 10)"
+    )
+    parser.add_argument("--min-time", dest="MIN_TIME",
+        type=float, default=0.001, metavar="SECONDS",
+        help="Ignore stages faster than this when comparing (default 0.001)"
+    )
+    args = parser.parse_args()
+    
+    font_file = args.FONT or find_default_font()
+    if font_file is None:
+        raise Exception("No font found, use --font to choose one.")
+    if (not path.isfile(font_file)):
+        raise Exception("Font file (\"{}\") does not exist.".format(font_file))
+    
+    sizes = args.SIZES or DEFAULT_SIZES
+    charsets = {k: DEFAULT_CHARSETS[k] for k in (args.CHARSETS or DEFAULT_CHARSETS.keys())}
+    
+    results = run(font_file, args.TTC_INDEX, sizes, charsets, args.REPEAT)
+    
+    if args.OUTPUT is not None:
+        with open(args.OUTPUT, "w") as f:
+            json.dump(results, f, indent=2)
+    
+    if args.BASELINE is not None:
+        with open(args.BASELINE) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.THRESHOLD / 100, args.MIN_TIME)
+        print ("{} regression(s) against baseline.".format(regressions))
+        if regressions > 0:
+            sys.exit(1)
@@ -9,19 +9,42 @@
 # Bodmer's Processing script for converting fonts with useful options:
 # https://github.com/Bodmer/TFT_eSPI/blob/master/Tools/Create_Smooth_Font/Create_font/Create_font.pde
 
-import freetype
-from copy import deepcopy
-from os import path
+import re
+import sys
+from heapq import merge
+from itertools import repeat
+from math import ceil, floor
+from operator import attrgetter
+from os import cpu_count, path
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator, Optional, TypeVar, Union
 
-from UnicodeRange import UnicodeRange, UnicodeBlocksDict
+from UnicodeRange import UnicodeRange, UnicodeRangeSet, UnicodeBlockKeys, UnicodeBlocksTable
 from Glyph import Glyph
-from VlwFont import VlwFont
+from GlyphTable import GlyphTable
+from VlwFont import AnyIOBase, VlwFont
+
+# freetype, logging, the process pool, the glyph cache and the modules only
+# the command line uses are imported where they're needed, so --help and
+# argument errors don't pay for loading them
+if TYPE_CHECKING:
+    import freetype
+    from concurrent.futures import Executor, ProcessPoolExecutor
+    from GlyphCache import GlyphCache
+    from OutputSink import OutputSink
+    from VlwReader import VlwReader
 
 # Processing ignores the font face's ascener and descender metrics,
 # measuring "d" and "p" characters instead.
 # Use this to choose whether to trust the font face's metrics for them.
 USE_FACE_ASCENDER_DESCENDER = True
 
+# largest size fit_size tries when not given candidate sizes
+FIT_MAX_SIZE = 512
+
+# with parallel rendering, the charmap is split into this many chunks per
+# worker so that workers finishing early (e.g. on blank glyphs) pick up more
+CHUNKS_PER_JOB = 4
+
 # convert int to 26.6 fixed point fraction
 def to_26_6(v: int) -> int:
     return v << 6
@@ -30,98 +53,73 @@ def to_26_6(v: int) -> int:
 def from_26_6(v: int) -> int:
     return round(v / 64)
 
-if __name__ == "__main__":
-    def get_args():
-        def unicode_blocks_list() -> str:
-            out: str = "Available Unicode Blocks\n"
-            out +=     "========================\n"
-            for k, v in UnicodeBlocksDict.items():
-                out += "  \"{}\": {} (U+{:04X}..U+{:04X})\n".format(k, v.name, v.begin, v.end)
-            
-            return out
-        
-        import argparse
-        parser = argparse.ArgumentParser(
-            prog = "vlwconv",
-            description = "Converts fonts to Processing's VLW format without installing Processing.",
-            epilog = unicode_blocks_list(),
-            formatter_class = argparse.RawDescriptionHelpFormatter
-        )
-        
-        parser.add_argument("-b", "--block", dest="BLOCKS", action="append",
-            choices=UnicodeBlocksDict.keys(), metavar="BLOCK", default=[],
-            help="Specify Unicode block to include in output (can use multiple times)"
-        )
-        parser.add_argument("-r", "--range", dest="RANGES", action="append",
-            metavar="BEGIN-END", default=[],
-            help="Specify custom hexadecimal character range to include in output (can use multiple times)"
-        )
-        parser.add_argument("-c", "--chars", dest="CHARS",
-            default="",
-            help="Include all chars from CHARS string in output"
-        )
-        parser.add_argument("-t", "--ttc-index", dest="TTC_INDEX",
-            type=int, default=0,
-            help="Index of desired face in TTC font."
-        )
-        parser.add_argument("-s", "--size", dest="SIZE",
-            type=int, required=True,
-            help="Font size."
-        )
-        parser.add_argument("INPUT_FILE",
-            help="Outline font to use as source"
-        )
-        parser.add_argument("OUTPUT_FILE",
-            help="VLW file to write"
-        )
-        
-        return parser.parse_args()
-    
-    # return sorted list of all characters to generate from args
-    # that is, all characters in specified blocks, ranges, chars
-    # return value is a sorted list of codepoint integers with no duplicates
-    def gen_charlist(args) -> list[int]:
-        charset = set() # set can't have duplicates!
-        
-        for b in args.BLOCKS:
-            ub = UnicodeBlocksDict[b]
-            charset.update({i for i in range(ub.begin, ub.end + 1)})
-        for r in args.RANGES:
-            ur = UnicodeRange.from_hex_string(r)
-            charset.update({i for i in range(ur.begin, ur.end + 1)})
-        charset.update({ord(c) for c in args.CHARS})
-        
-        return sorted(list(charset))
-    
-    args = get_args()
-    # print (args)
-    
-    input_file = args.INPUT_FILE
-    if (not path.isfile(input_file)):
-        raise Exception("Input file (\"{}\") does not exist.".format(input_file))
-    
-    output_file = args.OUTPUT_FILE
-    if (path.exists(output_file)):
-        raise Exception("Output file (\"{}\") already exists.".format(output_file))
+# return set of all characters to generate from blocks, ranges, chars and
+# text files chars_from (see chars_from_files), minus everything in
+# exclude_blocks, exclude_ranges, exclude_chars
+# blocks are keys of UnicodeBlocksDict, ranges are hex range strings
+def gen_charset(blocks: Iterable[str] = (), ranges: Iterable[str] = (), chars: str = "",
+        exclude_blocks: Iterable[str] = (), exclude_ranges: Iterable[str] = (), exclude_chars: str = "",
+        chars_from: Iterable[str] = ()) -> UnicodeRangeSet:
+    def to_set(blocks: Iterable[str], ranges: Iterable[str], chars: str) -> UnicodeRangeSet:
+        from UnicodeRange import UnicodeBlocksDict
+        out = UnicodeRangeSet([UnicodeBlocksDict[b] for b in blocks])
+        out |= UnicodeRangeSet([UnicodeRange.from_hex_string(r) for r in ranges])
+        out |= UnicodeRangeSet.from_codepoints(ord(c) for c in chars)
+        return out
     
-    size = args.SIZE
-    if (size <= 0):
-        raise Exception("Font size must be greater than 0.")
-    
-    charlist = gen_charlist(args)
-    if (len(charlist) == 0):
-        raise Exception("No characters to generate. Make sure to specify blocks, ranges, or chars.")
-    # print (charlist)
-    
-    ttc_index = args.TTC_INDEX
-    
-    vlw = VlwFont()
+    include = to_set(blocks, ranges, chars) | chars_from_files(chars_from)
+    return include - to_set(exclude_blocks, exclude_ranges, exclude_chars)
+
+# control characters (C0, DEL and C1), never taken from text files
+CONTROL_CHARS = UnicodeRangeSet([(0x00, 0x1F), (0x7F, 0x9F)])
+
+# set of all distinct characters in UTF-8 text files ("-" reads stdin)
+# files are read in chunks of chunk_size characters, so memory use is bounded
+# by the chunk size and the number of distinct characters, not file size
+# characters are taken literally (escape sequences aren't decoded), and
+# control characters such as line breaks are left out
+def chars_from_files(files: Iterable[str], chunk_size: int = 1 << 20) -> UnicodeRangeSet:
+    seen: set[str] = set()
     
+    for file_path in files:
+        if file_path == "-":
+            f = open(sys.stdin.fileno(), "r", encoding="utf-8-sig", closefd=False)
+        else:
+            f = open(file_path, "r", encoding="utf-8-sig")
+        
+        with f:
+            try:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    seen.update(chunk)
+            except UnicodeDecodeError as e:
+                raise Exception("Text file (\"{}\") isn't valid UTF-8: {}".format(file_path, e))
     
-    # load freetype face
-    # ==================
+    return UnicodeRangeSet.from_codepoints(ord(c) for c in seen) - CONTROL_CHARS
+
+# return sorted list of all characters to generate, see gen_charset
+# return value is a sorted list of codepoint integers with no duplicates
+def gen_charlist(*args, **kwargs) -> list[int]:
+    return list(gen_charset(*args, **kwargs))
+
+# font file path, or whole font file content already read into memory
+FontSource = Union[str, bytes]
+
+# file-like object handing freetype.Face the same bytes every time, so faces
+# opened from one in-memory font file all share its buffer instead of copying
+class _SharedFontData:
+    def __init__(self, data: bytes):
+        self._data = data
     
-    face = freetype.Face(input_file, ttc_index)
+    def read(self) -> bytes:
+        return self._data
+
+# open font (file path or content) and select its unicode charmap
+def load_face(font: FontSource, ttc_index: int = 0) -> "freetype.Face":
+    import freetype
+    face = freetype.Face(_SharedFontData(font) if isinstance(font, bytes) else font, ttc_index)
     try:
         face.select_charmap(freetype.FT_ENCODING_UNICODE)
     except freetype.FT_Exception as e:
@@ -130,6 +128,70 @@ if __name__ == "__main__":
         else:
             raise e
     
+    return face
+
+# read font file once and open every face in it (e.g. all weights in a TTC)
+# all faces share the one in-memory copy of the file
+# returns the file content (for make_pool / GlyphCache) and the faces
+def load_all_faces(input_file: str) -> tuple[bytes, list["freetype.Face"]]:
+    with open(input_file, "rb") as f:
+        data = f.read()
+    
+    first = load_face(data, 0)
+    return data, [first] + [load_face(data, i) for i in range(1, first.num_faces)]
+
+# font name as stored in VLW, from family and style names
+def face_name(face: "freetype.Face") -> str:
+    name = face.family_name.decode("ascii") # names are indeed just ascii
+    if face.style_name: name += " " + face.style_name.decode("ascii")
+    return name
+
+# enumerate the face's unicode charmap once, keeping only codepoints in charset
+# returns sorted list of (codepoint, glyph index) pairs the face can render,
+# so codepoints missing from the font are never visited
+def face_charmap(face: "freetype.Face", charset: UnicodeRangeSet) -> list[tuple[int, int]]:
+    charmap: list[tuple[int, int]] = []
+    if not charset:
+        return charmap
+    
+    last = charset.ranges()[-1][1]
+    c, idx = face.get_first_char()
+    while idx != 0 and c <= last:
+        if c in charset:
+            charmap.append((c, idx))
+        c, idx = face.get_next_char(c, idx)
+    
+    return charmap
+
+# split codepoints between a chain of faces in priority order (e.g. a Latin
+# face, then CJK and symbol fallbacks): each codepoint goes to the first face
+# that has it
+# charmaps are each face's face_charmap for the same charset; codepoints
+# already covered by an earlier face are tracked as an interval set, so no
+# face is ever asked about codepoints one at a time
+# returns one charmap per face, together covering each codepoint once
+def route_charmaps(charmaps: list[list[tuple[int, int]]]) -> list[list[tuple[int, int]]]:
+    covered = UnicodeRangeSet()
+    routed = []
+    for charmap in charmaps:
+        if covered:
+            charmap = [(c, idx) for c, idx in charmap if c not in covered]
+        routed.append(charmap)
+        covered |= UnicodeRangeSet.from_codepoints(c for c, idx in charmap)
+    
+    return routed
+
+# create VlwFont with metrics and names of face at size, but no glyphs
+# face can be reused for many sizes, set_char_size is called here
+def font_info(face: "freetype.Face", size: int) -> VlwFont:
+    import logging
+    log = logging.getLogger("vlwconv")
+    
+    if (size <= 0):
+        raise Exception("Font size must be greater than 0.")
+    
+    vlw = VlwFont()
+    
     # size (and many other metrics) are given as 26.6 fixed point fractions,
     # so get used to seeing `to_26_6` and `from_26_6`
     face.set_char_size(to_26_6(size)) # note: 72 dpi, so 1px == 1pt
@@ -139,7 +201,7 @@ if __name__ == "__main__":
     # ================
     
     vlw.height = from_26_6(face.size.height)
-    print ("Height: {}".format(vlw.height))
+    log.info("Height: {}".format(vlw.height))
     
     if USE_FACE_ASCENDER_DESCENDER:
         # trust font metrics - use size.ascender and size.descender
@@ -155,33 +217,377 @@ if __name__ == "__main__":
         face.load_char('p')
         vlw.descent = -(from_26_6(face.glyph.metrics.horiBearingY) - face.glyph.bitmap.rows) # VLW seems to expect positive val?
     
-    print ("Ascent: {}".format(vlw.ascent))
-    print ("Descent: {}".format(vlw.descent))
+    log.info("Ascent: {}".format(vlw.ascent))
+    log.info("Descent: {}".format(vlw.descent))
     
     
     # set other font info
     # ===================
     
-    vlw.name = face.family_name.decode("ascii") # names are indeed just ascii
-    if face.style_name: vlw.name += " " + face.style_name.decode("ascii")
+    vlw.name = face_name(face)
     vlw.psname = face.postscript_name.decode("ascii")
     vlw.aa = True
+    vlw.glyphs = GlyphTable()
+    
+    return vlw
+
+# total bitmap bytes of all glyphs in charmap at size, without rendering
+# anything: each glyph index is loaded (unrendered) once, and its hinted
+# metrics give its bitmap's width and height
+# face can be reused for many sizes, set_char_size is called here
+def measure_bitmap_bytes(face: "freetype.Face", size: int, charmap: list[tuple[int, int]]) -> int:
+    from freetype import FT_LOAD_DEFAULT, FT_Exception
+    from freetype.raw import FT_Load_Glyph
+    
+    face.set_char_size(to_26_6(size))
+    
+    # straight through ctypes, as face.glyph builds new wrapper objects on
+    # every access and this loop is otherwise all overhead
+    ft_face = face._FT_Face
+    lengths: dict[int, int] = {} # glyph index -> bitmap bytes
+    total = 0
+    for c, idx in charmap:
+        length = lengths.get(idx)
+        if length is None:
+            # hinting is the same as for rendering (FT_LOAD_RENDER), so the
+            # hinted metrics are grid-fitted to exactly the size of the
+            # bitmap rendering would produce
+            error = FT_Load_Glyph(ft_face, idx, FT_LOAD_DEFAULT)
+            if error:
+                raise FT_Exception(error)
+            metrics = ft_face.contents.glyph.contents.metrics
+            length = lengths[idx] = from_26_6(metrics.width) * from_26_6(metrics.height)
+        total += length
+    
+    return total
+
+# unhinted outline bounding boxes (x_min, y_min, x_max, y_max, in font units)
+# of the glyphs in charmap, each with the number of codepoints using it;
+# glyphs without an outline (e.g. spaces) are left out
+# loaded once without scaling, so approx_bitmap_bytes can scale them to any size
+def outline_boxes(face: "freetype.Face", charmap: list[tuple[int, int]]) -> list[tuple[int, int, int, int, int]]:
+    from freetype import FT_LOAD_NO_SCALE, FT_Exception
+    from freetype.raw import FT_Load_Glyph
+    
+    counts: dict[int, int] = {} # glyph index -> codepoints using it
+    for c, idx in charmap:
+        counts[idx] = counts.get(idx, 0) + 1
+    
+    # straight through ctypes, as in measure_bitmap_bytes
+    ft_face = face._FT_Face
+    boxes = []
+    for idx, n in counts.items():
+        error = FT_Load_Glyph(ft_face, idx, FT_LOAD_NO_SCALE)
+        if error:
+            raise FT_Exception(error)
+        metrics = ft_face.contents.glyph.contents.metrics
+        if metrics.width > 0 and metrics.height > 0:
+            boxes.append((metrics.horiBearingX, metrics.horiBearingY - metrics.height,
+                metrics.horiBearingX + metrics.width, metrics.horiBearingY, n))
+    
+    return boxes
+
+# total bitmap bytes of glyphs with boxes (from outline_boxes of a face with
+# units_per_em) at size, approximately: each box is scaled and rounded out to
+# whole pixels as FreeType does, but hinting is left out, which can move
+# each edge by a pixel, so this is close to measure_bitmap_bytes but not exact
+def approx_bitmap_bytes(boxes: list[tuple[int, int, int, int, int]], units_per_em: int, size: int) -> int:
+    scale = size / units_per_em
+    total = 0
+    for x_min, y_min, x_max, y_max, n in boxes:
+        total += (ceil(x_max * scale) - floor(x_min * scale)) * (ceil(y_max * scale) - floor(y_min * scale)) * n
+    
+    return total
+
+# size in bytes of the VLW file for charmap of face at size, predicted from
+# glyph metrics (see measure_bitmap_bytes) a few times faster than rendering it
+# fallbacks are (face, charmap) pairs of fallback faces (see route_charmaps)
+def estimate_size(face: "freetype.Face", size: int, charmap: list[tuple[int, int]],
+        fallbacks: Iterable[tuple["freetype.Face", list[tuple[int, int]]]] = ()) -> int:
+    vlw = VlwFont()
+    vlw.name = face_name(face)
+    vlw.psname = face.postscript_name.decode("ascii")
+    
+    glyph_count = len(charmap)
+    bitmap_size = measure_bitmap_bytes(face, size, charmap)
+    for fallback_face, fallback_charmap in fallbacks:
+        glyph_count += len(fallback_charmap)
+        bitmap_size += measure_bitmap_bytes(fallback_face, size, fallback_charmap)
+    
+    return vlw.stream_size(glyph_count, bitmap_size)
+
+# largest of sizes (default 1 to FIT_MAX_SIZE) whose VLW file for charmap of
+# face (and fallbacks) fits in max_bytes (see estimate_size), or None if none
+# of them fit
+# binary search, as file size grows with font size: first over
+# approx_bitmap_bytes, which only loads each glyph once for all sizes, then
+# confirmed with estimate_size around the size that gives, which usually
+# takes two or three exact estimates instead of one per step
+def fit_size(face: "freetype.Face", charmap: list[tuple[int, int]], max_bytes: int, sizes: Iterable[int] = (),
+        fallbacks: Iterable[tuple["freetype.Face", list[tuple[int, int]]]] = ()) -> Optional[int]:
+    fallbacks = list(fallbacks)
+    sizes = sorted(sizes) or list(range(1, FIT_MAX_SIZE + 1))
+    
+    vlw = VlwFont()
+    vlw.name = face_name(face)
+    vlw.psname = face.postscript_name.decode("ascii")
+    parts = [(face, charmap)] + fallbacks
+    glyph_count = sum(len(part_charmap) for f, part_charmap in parts)
+    boxes = [(f.units_per_EM, outline_boxes(f, part_charmap)) for f, part_charmap in parts]
+    
+    def approx_fits(i: int) -> bool:
+        bitmap_size = sum(approx_bitmap_bytes(b, units_per_em, sizes[i]) for units_per_em, b in boxes)
+        return vlw.stream_size(glyph_count, bitmap_size) <= max_bytes
+    
+    def fits(i: int) -> bool:
+        return estimate_size(face, sizes[i], charmap, fallbacks) <= max_bytes
+    
+    guess, hi = 0, len(sizes)
+    while guess < hi:
+        mid = (guess + hi) // 2
+        if approx_fits(mid):
+            guess = mid + 1
+        else:
+            hi = mid
+    
+    lo, hi = 0, len(sizes) # sizes[:lo] are known to fit, sizes[hi:] not to
     
+    # probe down from the guess, then up, widening the step on every miss
+    i, step = guess - 1, 1
+    while i >= lo:
+        if fits(i):
+            lo = i + 1
+            break
+        hi = i
+        i, step = i - step, step * 2
+    i, step = max(lo, guess), 1
+    while i < hi:
+        if not fits(i):
+            hi = i
+            break
+        lo = i + 1
+        i, step = i + step, step * 2
+    
+    # then close in on whatever gap is left
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            lo = mid + 1
+        else:
+            hi = mid
+    
+    return sizes[lo - 1] if lo > 0 else None
+
+# render all characters in charmap from an already loaded face at one size
+# charmap is a list of (codepoint, glyph index) pairs from face_charmap
+# face can be reused for many sizes, set_char_size is called here
+# if pool is given (see make_pool), glyphs are rendered by its workers instead
+# if cache is given, see iter_font_glyphs
+# fallbacks are (face, charmap, cache_font) per fallback face, in priority
+# order, with charmaps from route_charmaps; a pool must then have been made
+# with the fallback fonts after face's, in the same order
+# bitmap_lut (see make_bitmap_lut) is set on the VlwFont, as by convert
+def render_font(face: "freetype.Face", size: int, charmap: list[tuple[int, int]], pool: Optional["Executor"] = None, pool_chunks: int = 1,
+        cache: Optional["GlyphCache"] = None, cache_font: str = "",
+        fallbacks: Iterable[tuple["freetype.Face", list[tuple[int, int]], str]] = (), bitmap_lut: Optional[bytes] = None) -> VlwFont:
+    vlw = font_info(face, size)
+    vlw.bitmap_lut = bitmap_lut
     
     # get information for all glyphs in-memory
-    # ========================================
+    parts = [(face, charmap, cache_font, 0)] + [(f, f_charmap, f_cache_font, i + 1)
+        for i, (f, f_charmap, f_cache_font) in enumerate(fallbacks)]
+    vlw.glyphs = GlyphTable(iter_merged_glyphs(parts, size, pool, pool_chunks, cache))
+    
+    return vlw
+
+# render glyphs of face at size for charmap one at a time, in charmap order
+# use with VlwFont.write_glyph_stream to avoid holding all bitmaps in memory
+# if pool is given (see make_pool), glyphs are rendered by its workers instead
+# (pool_font is the position of face's font among those the pool was made with)
+# if cache is given, glyphs found in it under cache_font (a GlyphCache.font_key)
+# are reused and only the rest are rendered, then added to the cache
+def iter_font_glyphs(face: "freetype.Face", size: int, charmap: list[tuple[int, int]], pool: Optional["Executor"] = None, pool_chunks: int = 1,
+        cache: Optional["GlyphCache"] = None, cache_font: str = "", pool_font: int = 0) -> Iterator[Glyph]:
+    if cache is None:
+        yield from _iter_rendered_glyphs(face, size, charmap, pool, pool_chunks, pool_font)
+        return
+    
+    # render everything the cache doesn't have up front (in parallel if
+    # possible), and read the rest back from the cache in batches
+    cached = cache.cached_indices(cache_font, size, (idx for c, idx in charmap))
+    rendered = _iter_rendered_glyphs(face, size, [(c, idx) for c, idx in charmap if idx not in cached], pool, pool_chunks, pool_font)
+    
+    for begin in range(0, len(charmap), cache.BATCH):
+        batch = charmap[begin:begin+cache.BATCH]
+        hits = cache.get_glyphs(cache_font, size, (idx for c, idx in batch if idx in cached))
+        new: dict[int, Glyph] = {}
+        
+        for c, idx in batch:
+            if idx not in cached:
+                g = next(rendered)
+                new[idx] = g
+            elif idx in hits:
+                g = hits[idx].for_codepoint(c)
+            else:
+                # evicted by another build since cached_indices, render it now
+                face.set_char_size(to_26_6(size))
+                g = next(render_glyphs(face, [(c, idx)]))
+            yield g
+        
+        cache.put_glyphs(cache_font, size, new)
+
+# glyphs of a chain of faces at size, merged into one stream in codepoint order
+# parts are (face, charmap, cache_font, pool_font) per face, with charmaps
+# from route_charmaps; each face renders its own part as by iter_font_glyphs
+def iter_merged_glyphs(parts: list[tuple["freetype.Face", list[tuple[int, int]], str, int]], size: int,
+        pool: Optional["Executor"] = None, pool_chunks: int = 1, cache: Optional["GlyphCache"] = None) -> Iterator[Glyph]:
+    streams = [iter_font_glyphs(face, size, charmap, pool, pool_chunks, cache, cache_font, pool_font)
+        for face, charmap, cache_font, pool_font in parts]
+    if len(streams) == 1:
+        return streams[0]
+    return merge(*streams, key=attrgetter("codepoint"))
+
+# write base (an existing VLW of the same face and size) to io, updated to
+# contain exactly the characters in charmap: glyphs base lacks are rendered,
+# glyphs not in charmap are dropped, and all others are copied over unchanged
+# pool, pool_chunks, cache and cache_font are as for iter_font_glyphs
+# bitmap_lut (see make_bitmap_lut) is applied to added glyphs only
+# returns (number of glyphs added, number of glyphs removed)
+def patch_font(face: "freetype.Face", size: int, charmap: list[tuple[int, int]], base: "VlwReader", io: AnyIOBase,
+        pool: Optional["Executor"] = None, pool_chunks: int = 1, cache: Optional["GlyphCache"] = None, cache_font: str = "",
+        bitmap_lut: Optional[bytes] = None) -> tuple[int, int]:
+    vlw = font_info(face, size)
+    vlw.bitmap_lut = bitmap_lut
+    
+    # base glyphs are reused as-is, so they must come from the same face and size
+    expected = (vlw.name, vlw.psname, vlw.height, vlw.ascent, vlw.descent)
+    found = (base.name, base.psname, base.height, base.ascent, base.descent)
+    if expected != found:
+        raise Exception("Existing font (name, psname, height, ascent, descent: {}) doesn't match face at size {} ({}).".format(found, size, expected))
+    
+    wanted = {c for c, idx in charmap}
+    have = set(base.codepoints)
+    keep = [i for i, c in enumerate(base.codepoints) if c in wanted]
+    added = [(c, idx) for c, idx in charmap if c not in have]
     
-    vlw.glyphs = []
+    glyphs = GlyphTable(iter_font_glyphs(face, size, added, pool, pool_chunks, cache, cache_font))
+    vlw.write_patched_stream(io, base, keep, glyphs)
     
-    for c in charlist:
-        idx = face.get_char_index(c)
-        if idx == 0:
-            print ("Font has no glyph for codepoint U+{:04X}.".format(c))
-            continue # no point including missing chars
+    return len(added), len(base) - len(keep)
+
+# render each glyph index in charmap once; codepoints sharing a glyph index
+# with an earlier one (e.g. CJK compatibility ideographs, fullwidth forms)
+# get a copy of its glyph sharing the same bitmap buffer
+# a glyph is only held on to until the last codepoint sharing it
+def _iter_rendered_glyphs(face: "freetype.Face", size: int, charmap: list[tuple[int, int]], pool: Optional["Executor"], pool_chunks: int, pool_font: int = 0) -> Iterator[Glyph]:
+    uses: dict[int, int] = {} # glyph index -> codepoints using it
+    unique: list[tuple[int, int]] = [] # first codepoint of each glyph index
+    for c, idx in charmap:
+        n = uses.get(idx, 0)
+        if n == 0:
+            unique.append((c, idx))
+        uses[idx] = n + 1
+    
+    rendered = _iter_unique_rendered_glyphs(face, size, unique, pool, pool_chunks, pool_font)
+    if len(unique) == len(charmap):
+        yield from rendered
+        return
+    
+    shared: dict[int, Glyph] = {} # glyph index -> glyph still to be reused
+    for c, idx in charmap:
+        g = shared.get(idx)
+        g = next(rendered) if g is None else g.for_codepoint(c)
+        
+        uses[idx] -= 1
+        if uses[idx] > 0:
+            shared[idx] = g
+        else:
+            shared.pop(idx, None)
         
-        # load_glyph with FT_LOAD_RENDER
+        yield g
+
+def _iter_unique_rendered_glyphs(face: "freetype.Face", size: int, charmap: list[tuple[int, int]], pool: Optional["Executor"], pool_chunks: int, pool_font: int) -> Iterator[Glyph]:
+    if pool is None:
+        face.set_char_size(to_26_6(size))
+        yield from render_glyphs(face, charmap)
+    else:
+        # workers each have their own face; chunks come back in charmap order
+        chunks = split_charmap(charmap, pool_chunks)
+        for glyphs in pool.map(_render_chunk, repeat(pool_font), repeat(face.face_index), repeat(size), chunks):
+            yield from glyphs
+
+# copy 8-bit FreeType bitmap into a new bytearray with stride == width
+# reads FT_Bitmap memory directly instead of through Bitmap.buffer, which
+# builds a Python list of every byte each time it's accessed
+def bitmap_bytes(bitmap: "freetype.Bitmap") -> bytearray:
+    from ctypes import string_at
+    
+    ft_bitmap = bitmap._FT_Bitmap
+    rows = ft_bitmap.rows
+    width = ft_bitmap.width
+    pitch = ft_bitmap.pitch
+    if rows == 0 or width == 0:
+        return bytearray()
+    
+    # one copy of the whole bitmap, including any row padding
+    stride = abs(pitch)
+    raw = string_at(ft_bitmap.buffer, stride * rows)
+    if pitch == width:
+        return bytearray(raw)
+    
+    # pitch < 0 means bottom row comes first
+    row_offs = range(0, stride * rows, stride)
+    if pitch < 0:
+        row_offs = reversed(row_offs)
+    
+    # strip padding (and flip if needed) with one join over row views
+    view = memoryview(raw)
+    return bytearray(b"".join([view[off:off+width] for off in row_offs]))
+
+# 256-entry table for VlwFont.bitmap_lut adjusting antialiased coverage
+# values, applied in this order:
+#   gamma: v = 255 * (v / 255) ** (1 / gamma), above 1 makes edges heavier
+#   contrast: stretch values away from the middle (1 or more, clamped)
+#   threshold: values from threshold up become 255, the rest 0 (no antialiasing)
+#   min_alpha: values below min_alpha become 0, dropping faint fringes
+# 0 always stays 0, so empty pixels stay empty
+# returns None if the settings don't change anything
+def make_bitmap_lut(gamma: float = 1.0, contrast: float = 1.0, threshold: Optional[int] = None, min_alpha: int = 0) -> Optional[bytes]:
+    if (gamma <= 0):
+        raise ValueError("Gamma must be greater than 0.")
+    if (contrast < 1):
+        raise ValueError("Contrast must be 1 or more.")
+    if (threshold is not None and not 1 <= threshold <= 255):
+        raise ValueError("Threshold must be between 1 and 255.")
+    if (not 0 <= min_alpha <= 255):
+        raise ValueError("Minimum alpha must be between 0 and 255.")
+    
+    lut = bytearray(256)
+    for v in range(1, 256):
+        x = 255 * (v / 255) ** (1 / gamma)
+        x = 127.5 + (x - 127.5) * contrast
+        x = min(max(int(x + 0.5), 0), 255)
+        if threshold is not None:
+            x = 255 if x >= threshold else 0
+        lut[v] = x if x >= min_alpha else 0
+    
+    if lut == bytes(range(256)):
+        return None
+    return bytes(lut)
+
+# render glyphs for all (codepoint, glyph index) pairs in charmap
+# face must already have its size set
+# yields glyphs in the same order as charmap
+def render_glyphs(face: "freetype.Face", charmap: list[tuple[int, int]]) -> Iterator[Glyph]:
+    import logging
+    from freetype import FT_LOAD_RENDER
+    
+    log = logging.getLogger("vlwconv")
+    debug = log.isEnabledFor(logging.DEBUG) # checked once, this loop is hot
+    
+    for c, idx in charmap:
         # bitmap is rendered in FT_RENDER_MODE_NORMAL mode (8-bit antialiased)
-        face.load_glyph(idx, freetype.FT_LOAD_RENDER)
+        face.load_glyph(idx, FT_LOAD_RENDER)
         
         # FT_Glyph_Metrics struct:
         # https://github.com/rougier/freetype-py/blob/51ee6e15e6d7b3a9ca0f5e96b11bfa8c07575c36/freetype/ft_structs.py#L353
@@ -193,32 +599,710 @@ if __name__ == "__main__":
         g.advance = from_26_6(face.glyph.metrics.horiAdvance)
         g.bearing_y = from_26_6(face.glyph.metrics.horiBearingY)
         g.bearing_x = from_26_6(face.glyph.metrics.horiBearingX)
-        g.bitmap_buf = bytearray(face.glyph.bitmap.width * face.glyph.bitmap.rows)
+        g.bitmap_buf = bitmap_bytes(face.glyph.bitmap)
+        
+        if debug: log.debug("Processed character U+{:04X}.".format(c))
+        # print ("  adv: {}, bY: {}, bX: {}, w: {}, h: {}.".format(g.advance, g.bearing_y, g.bearing_x, g.bitmap_width, g.bitmap_height))
+        # print (g.bitmap_string())
+        yield g
+
+# split charmap into at most n contiguous, similarly sized chunks
+def split_charmap(charmap: list[tuple[int, int]], n: int) -> list[list[tuple[int, int]]]:
+    n = max(1, min(n, len(charmap)))
+    step, extra = divmod(len(charmap), n)
+    
+    chunks = []
+    begin = 0
+    for i in range(0, n):
+        end = begin + step + (1 if i < extra else 0)
+        chunks.append(charmap[begin:end])
+        begin = end
+    
+    return chunks
+
+# fonts each parallel rendering worker process renders from, and the faces
+# it has opened from them so far (by font position and face index)
+_worker_fonts: list[FontSource] = []
+_worker_faces: dict[tuple[int, int], "freetype.Face"] = {}
+
+def _init_worker(fonts: list[FontSource]):
+    global _worker_fonts
+    _worker_fonts = fonts
+
+def _render_chunk(font: int, ttc_index: int, size: int, charmap: list[tuple[int, int]]) -> list[Glyph]:
+    face = _worker_faces.get((font, ttc_index))
+    if face is None:
+        face = _worker_faces[(font, ttc_index)] = load_face(_worker_fonts[font], ttc_index)
+    face.set_char_size(to_26_6(size))
+    return list(render_glyphs(face, charmap))
+
+# number of worker processes to use; jobs <= 0 means one per cpu core
+def resolve_jobs(jobs: int) -> int:
+    if jobs <= 0:
+        return cpu_count() or 1
+    return jobs
+
+# create process pool of jobs workers for render_font and iter_font_glyphs
+# each worker opens its own faces from font (a file path or its content, or a
+# list of them for fallback fonts, see iter_font_glyphs' pool_font), so one
+# pool can render any face of a collection
+def make_pool(font: Union[FontSource, list[FontSource]], jobs: int) -> "ProcessPoolExecutor":
+    from concurrent.futures import ProcessPoolExecutor
+    fonts = font if isinstance(font, list) else [font]
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(fonts,))
+
+# convert a font to VLW at each of the given sizes
+# face_or_path may be an opened freetype.Face (ttc_index is then ignored) or a
+# path to a font file (or its content), which is opened and parsed only once
+# for all sizes
+# jobs > 1 renders glyphs in that many worker processes (needs a path),
+# jobs <= 0 uses all cpu cores; output is identical to serial rendering
+# codepoints may be a UnicodeRangeSet or any iterable of codepoint integers;
+# codepoints the face doesn't have are left out
+# if cache is given, previously rendered glyphs are reused (needs a path)
+# fallbacks are font file paths (or contents, face 0 of each is used) for
+# codepoints the face lacks, in priority order (see route_charmaps); names and
+# metrics still come from face
+# bitmap_lut (see make_bitmap_lut) is set on every VlwFont, so it's applied
+# when they're written; their glyphs keep the bitmaps as rendered
+# returns one VlwFont per size, in the same order as sizes
+def convert(face_or_path: Union["freetype.Face", FontSource], sizes: Iterable[int], codepoints: Union[UnicodeRangeSet, Iterable[int]], ttc_index: int = 0, jobs: int = 1,
+        cache: Optional["GlyphCache"] = None, fallbacks: Iterable[FontSource] = (), bitmap_lut: Optional[bytes] = None) -> list[VlwFont]:
+    if not isinstance(face_or_path, (str, bytes)):
+        if jobs != 1:
+            raise ValueError("Parallel rendering needs a font file path, not a Face", jobs)
+        if cache is not None:
+            raise ValueError("Glyph cache needs a font file path, not a Face")
+        face = face_or_path
+    else:
+        face = load_face(face_or_path, ttc_index)
+    fonts = [face_or_path] + list(fallbacks)
+    faces = [face] + [load_face(font) for font in fonts[1:]]
+    
+    cache_fonts = [""] * len(fonts)
+    if cache is not None:
+        import freetype
+        cache_fonts = [cache.font_key(font, f.face_index, freetype.FT_LOAD_RENDER, freetype.version()) for font, f in zip(fonts, faces)]
+    
+    if not isinstance(codepoints, UnicodeRangeSet):
+        codepoints = UnicodeRangeSet.from_codepoints(codepoints)
+    charmaps = route_charmaps([face_charmap(f, codepoints) for f in faces])
+    fallback_parts = list(zip(faces[1:], charmaps[1:], cache_fonts[1:]))
+    
+    def render(size: int, pool: Optional["Executor"], pool_chunks: int) -> VlwFont:
+        return render_font(face, size, charmaps[0], pool, pool_chunks, cache, cache_fonts[0], fallback_parts, bitmap_lut)
+    
+    jobs = resolve_jobs(jobs)
+    if jobs == 1:
+        return [render(size, None, 1) for size in sizes]
+    
+    with make_pool(fonts, jobs) as pool:
+        chunks = jobs * CHUNKS_PER_JOB
+        return [render(size, pool, chunks) for size in sizes]
+
+# parse comma separated list of sizes, e.g. "12,16,24"
+def parse_sizes(s: str) -> list[int]:
+    return [int(v) for v in s.split(",") if v.strip() != ""]
+
+# output file name for a size and font name
+# OUTPUT_FILE may contain "{size}" and "{name}" (made safe for file names)
+def output_file_for(output_file: str, size: int, name: str) -> str:
+    safe_name = re.sub(r"[^\w\-]+", "_", name).strip("_")
+    return output_file.replace("{size}", str(size)).replace("{name}", safe_name)
+
+if __name__ == "__main__":
+    # "vlwconv serve ..." runs a conversion server instead, see VlwServer
+    def serve(argv: list[str]):
+        import argparse
+        import asyncio
+        import logging
+        from VlwServer import VlwServer
+        
+        parser = argparse.ArgumentParser(
+            prog = "vlwconv serve",
+            description = "Answers JSON conversion requests (one per line) from a Unix socket or stdin, keeping fonts open between requests."
+        )
+        parser.add_argument("--socket", dest="SOCKET",
+            default=None, metavar="PATH",
+            help="Listen on Unix socket at PATH (default: read stdin, answer on stdout until end of input)"
+        )
+        parser.add_argument("-j", "--jobs", dest="JOBS",
+            type=int, default=1,
+            help="Worker processes converting requests concurrently; 0 uses all cpu cores (default 1)"
+        )
+        parser.add_argument("--max-faces", dest="MAX_FACES",
+            type=int, default=16,
+            help="Font faces each worker keeps open between requests (default 16)"
+        )
+        parser.add_argument("-q", "--quiet", dest="QUIET", action="count", default=0,
+            help="Print less (use twice for errors only)"
+        )
+        parser.add_argument("-v", "--verbose", dest="VERBOSE", action="count", default=0,
+            help="Print more"
+        )
+        args = parser.parse_args(argv)
+        
+        # stdout may be carrying responses, so log to stderr; per-font
+        # metrics are left out unless asked for with -v
+        logging.basicConfig(format="%(message)s",
+            level=logging.WARNING + 10 * (args.QUIET - args.VERBOSE))
+        if (args.MAX_FACES <= 0):
+            raise Exception("--max-faces must be greater than 0.")
         
-        # pitch < 0 means bottom row comes first
-        up_flow = face.glyph.bitmap.pitch < 0
+        async def run():
+            server = VlwServer(args.JOBS, args.MAX_FACES)
+            try:
+                if args.SOCKET is not None:
+                    await server.serve_unix(args.SOCKET)
+                else:
+                    await server.serve_stdio()
+            finally:
+                server.close()
+        
+        asyncio.run(run())
+    
+    # "vlwconv build MANIFEST" builds every out of date target of a manifest, see Manifest
+    def build(argv: list[str]) -> int:
+        import argparse
+        import logging
+        from concurrent.futures import as_completed
+        from os import makedirs
+        from Manifest import Manifest
+        
+        parser = argparse.ArgumentParser(
+            prog = "vlwconv build",
+            description = "Builds the fonts listed in a manifest, skipping those whose font, options and converter haven't changed since they were last built."
+        )
+        parser.add_argument("-j", "--jobs", dest="JOBS",
+            type=int, default=0,
+            help="Build this many targets at once; 0 uses all cpu cores (default 0)"
+        )
+        parser.add_argument("-f", "--force", dest="FORCE", action="store_true",
+            help="Rebuild every target, even if up to date"
+        )
+        parser.add_argument("-q", "--quiet", dest="QUIET", action="count", default=0,
+            help="Print less (use twice for errors only)"
+        )
+        parser.add_argument("-v", "--verbose", dest="VERBOSE", action="count", default=0,
+            help="Print more"
+        )
+        parser.add_argument("MANIFEST",
+            help="Manifest file (.toml, or JSON)"
+        )
+        args = parser.parse_args(argv)
+        
+        logging.basicConfig(format="%(message)s",
+            level=logging.INFO + 10 * (args.QUIET - args.VERBOSE))
+        log = logging.getLogger("vlwconv")
+        
+        manifest = Manifest.load(args.MANIFEST)
+        
+        # (target, stamp) for every target to build
+        stale = []
+        for target in manifest.targets:
+            try:
+                up_to_date, stamp = manifest.check(target)
+            except OSError as e:
+                log.error("{}: {}".format(target.output, e))
+                return 1
+            if (up_to_date and not args.FORCE):
+                for output_file in manifest.outputs(target):
+                    log.debug("Up to date: \"{}\".".format(output_file))
+                continue
+            for output_file in manifest.outputs(target):
+                makedirs(path.dirname(path.abspath(output_file)), exist_ok=True)
+            stale.append((target, stamp))
+        
+        failed = 0
+        def done(target: "ConvertRequest", stamp: dict, response: Optional[dict], error: Optional[Exception]):
+            nonlocal failed
+            if error is not None:
+                failed += 1
+                log.error("Failed \"{}\": {}".format(target.output, error))
+                return
+            manifest.write_stamp(target, stamp)
+            for f in response["fonts"]:
+                log.info("Wrote \"{}\".".format(f["file"]))
+        
+        jobs = min(resolve_jobs(args.JOBS), len(stale))
+        if jobs <= 1:
+            for target, stamp in stale:
+                try:
+                    done(target, stamp, target.run(), None)
+                except Exception as e:
+                    done(target, stamp, None, e)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(target.run): (target, stamp) for target, stamp in stale}
+                for future in as_completed(futures):
+                    target, stamp = futures[future]
+                    error = future.exception()
+                    done(target, stamp, None if error is not None else future.result(), error)
         
-        # copy bitmap data
-        # just implement as a loop because then we get free stride change if necessary
-        for y in range(0, face.glyph.bitmap.rows):
-            if up_flow: src_row_off = (face.glyph.bitmap.rows-1 - y) * -face.glyph.bitmap.pitch
-            else: src_row_off = y * face.glyph.bitmap.pitch
-            dest_row_off = y * face.glyph.bitmap.width
+        log.info("{} built, {} up to date, {} failed.".format(len(stale) - failed,
+            len(manifest.targets) - len(stale), failed))
+        return 1 if failed > 0 else 0
+    
+    # "vlwconv inspect FILE" describes an existing VLW file, see VlwReader
+    def inspect(argv: list[str]):
+        import argparse
+        import logging
+        from VlwReader import VlwReader
+        
+        parser = argparse.ArgumentParser(
+            prog = "vlwconv inspect",
+            description = "Prints metrics and coverage of a VLW font, and optionally a preview of some text drawn with it."
+        )
+        parser.add_argument("-p", "--preview", dest="PREVIEW",
+            default=None, metavar="TEXT",
+            help="Draw TEXT with the font, as ASCII art (or to a PGM image with --pgm)"
+        )
+        parser.add_argument("--pgm", dest="PGM",
+            default=None, metavar="FILE",
+            help="Write the preview to FILE as a PGM image instead of printing it"
+        )
+        parser.add_argument("--ranges", dest="RANGES", action="store_true",
+            help="List every range of codepoints covered, not just a count per Unicode block"
+        )
+        parser.add_argument("VLW_FILE",
+            help="VLW file to inspect"
+        )
+        args = parser.parse_args(argv)
+        
+        logging.basicConfig(format="%(message)s", level=logging.INFO)
+        log = logging.getLogger("vlwconv")
+        
+        if (not path.isfile(args.VLW_FILE)):
+            raise Exception("VLW file (\"{}\") does not exist.".format(args.VLW_FILE))
+        if (args.PGM is not None and args.PREVIEW is None):
+            raise Exception("--pgm needs a preview text (-p).")
+        
+        with VlwReader.open(args.VLW_FILE) as vlw:
+            print ("File:            {} ({} bytes)".format(args.VLW_FILE, path.getsize(args.VLW_FILE)))
+            print ("Name:            {}".format(vlw.name))
+            print ("PostScript name: {}".format(vlw.psname))
+            print ("Version:         {}".format(vlw.version))
+            print ("Height:          {}".format(vlw.height))
+            print ("Ascent:          {}".format(vlw.ascent))
+            print ("Descent:         {}".format(vlw.descent))
+            print ("Antialiased:     {}".format("yes" if vlw.aa else "no"))
+            print ("Glyphs:          {} ({} bitmap bytes)".format(len(vlw), vlw.bitmap_offsets[-1] - vlw.bitmap_offsets[0]))
+            
+            print ("Coverage by Unicode block:")
+            outside = len(vlw)
+            for k, begin, end, name in UnicodeBlocksTable:
+                n = vlw.count_in(begin, end)
+                outside -= n
+                if n > 0:
+                    print ("  {:<40} {:>6} of {:<6} (U+{:04X}..U+{:04X})".format(k, n, end - begin + 1, begin, end))
+            if outside > 0:
+                print ("  {:<40} {:>6}".format("(outside listed blocks)", outside))
+            
+            if args.RANGES:
+                print ("Ranges:")
+                for begin, end in vlw.coverage().ranges():
+                    print ("  U+{:04X}..U+{:04X} ({})".format(begin, end, end - begin + 1))
             
-            # for x in range(0, face.glyph.bitmap.width):
-            #     src_idx = src_row_off + x
-            #     dest_idx = dest_row_off + x
-            #     g.bitmap_buf[dest_idx] = face.glyph.bitmap.buffer[src_idx]
+            if args.PREVIEW is not None:
+                missing = "".join(dict.fromkeys(ch for ch in args.PREVIEW if ord(ch) not in vlw))
+                if missing:
+                    log.warning("Font has no glyph for: {}".format(" ".join("U+{:04X}".format(ord(ch)) for ch in missing)))
+                
+                preview = vlw.render_text(args.PREVIEW)
+                if args.PGM is not None:
+                    with open(args.PGM, "wb") as f:
+                        f.write("P5\n{} {}\n255\n".format(preview.bitmap_width, preview.bitmap_height).encode("ascii"))
+                        f.write(preview.bitmap_buf)
+                    log.info("Wrote \"{}\".".format(args.PGM))
+                else:
+                    print ("Preview:")
+                    print (preview.bitmap_string(), end="")
+    
+    if (len(sys.argv) > 1 and sys.argv[1] == "inspect"):
+        inspect(sys.argv[2:])
+        sys.exit()
+    if (len(sys.argv) > 1 and sys.argv[1] == "serve"):
+        serve(sys.argv[2:])
+        sys.exit()
+    if (len(sys.argv) > 1 and sys.argv[1] == "build"):
+        sys.exit(build(sys.argv[2:]))
+    
+    from OutputSink import CArraySink, CompressedSink, HashSink, OutputSink, TeeSink
+    
+    def get_args():
+        def unicode_blocks_list() -> str:
+            out: str = "Available Unicode Blocks\n"
+            out +=     "========================\n"
+            for k, begin, end, name in UnicodeBlocksTable:
+                out += "  \"{}\": {} (U+{:04X}..U+{:04X})\n".format(k, name, begin, end)
             
-            # replace entire slice at once for more speed
-            src_row_end = src_row_off+face.glyph.bitmap.width
-            dest_row_end = dest_row_off+face.glyph.bitmap.width
-            g.bitmap_buf[dest_row_off:dest_row_end] = face.glyph.bitmap.buffer[src_row_off:src_row_end]
+            return out
         
-        vlw.glyphs.append(g)
-        print ("Processed character U+{:04X}.".format(c))
-        # print ("  adv: {}, bY: {}, bX: {}, w: {}, h: {}.".format(g.advance, g.bearing_y, g.bearing_x, g.bitmap_width, g.bitmap_height))
-        # print (g.bitmap_string())
+        import argparse
+        
+        # block list epilog is long, only build it when help is shown
+        class ArgumentParser(argparse.ArgumentParser):
+            def format_help(self) -> str:
+                if self.epilog is None:
+                    self.epilog = unicode_blocks_list()
+                return super().format_help()
+        
+        parser = ArgumentParser(
+            prog = "vlwconv",
+            description = "Converts fonts to Processing's VLW format without installing Processing. " +
+                "Run \"vlwconv build -h\" for manifest builds, \"vlwconv serve -h\" for the conversion server, " +
+                "\"vlwconv inspect -h\" to examine VLW files.",
+            formatter_class = argparse.RawDescriptionHelpFormatter
+        )
+        
+        parser.add_argument("-b", "--block", dest="BLOCKS", action="append",
+            choices=UnicodeBlockKeys, metavar="BLOCK", default=[],
+            help="Specify Unicode block to include in output (can use multiple times)"
+        )
+        parser.add_argument("-r", "--range", dest="RANGES", action="append",
+            metavar="BEGIN-END", default=[],
+            help="Specify custom hexadecimal character range to include in output (can use multiple times)"
+        )
+        parser.add_argument("-c", "--chars", dest="CHARS",
+            default="",
+            help="Include all chars from CHARS string in output"
+        )
+        parser.add_argument("-C", "--chars-from", dest="CHARS_FROM", action="append",
+            metavar="FILE", default=[],
+            help="Include all chars found in UTF-8 text FILE (\"-\" for stdin), e.g. a translation catalogue; control chars are left out (can use multiple times)"
+        )
+        parser.add_argument("--exclude-block", dest="EXCLUDE_BLOCKS", action="append",
+            choices=UnicodeBlockKeys, metavar="BLOCK", default=[],
+            help="Specify Unicode block to leave out of output (can use multiple times)"
+        )
+        parser.add_argument("-x", "--exclude-range", dest="EXCLUDE_RANGES", action="append",
+            metavar="BEGIN-END", default=[],
+            help="Specify custom hexadecimal character range to leave out of output (can use multiple times)"
+        )
+        parser.add_argument("--exclude-chars", dest="EXCLUDE_CHARS",
+            default="",
+            help="Leave all chars from EXCLUDE_CHARS string out of output"
+        )
+        parser.add_argument("-t", "--ttc-index", dest="TTC_INDEX",
+            type=int, default=0,
+            help="Index of desired face in TTC font."
+        )
+        parser.add_argument("-a", "--all-faces", dest="ALL_FACES", action="store_true",
+            help="Convert every face in a TTC font (reading the file only once); OUTPUT_FILE must then contain \"{name}\"."
+        )
+        parser.add_argument("-j", "--jobs", dest="JOBS",
+            type=int, default=1,
+            help="Number of processes used to render glyphs (0 uses all cores, default 1)."
+        )
+        parser.add_argument("-u", "--update", dest="UPDATE", action="store_true",
+            help="If OUTPUT_FILE exists, update it in place: only render characters it lacks, drop characters no longer requested, and copy the rest unchanged."
+        )
+        parser.add_argument("--cache-dir", dest="CACHE_DIR",
+            default=None,
+            help="Directory of glyph cache shared between runs; only glyphs not in it are rendered."
+        )
+        parser.add_argument("--cache-size", dest="CACHE_SIZE",
+            type=int, default=256, metavar="MB",
+            help="Glyph cache size limit in MB, least recently used glyphs are evicted (default 256)."
+        )
+        parser.add_argument("-s", "--size", dest="SIZES", action="extend",
+            type=parse_sizes, default=[], metavar="SIZE[,SIZE...]",
+            help="Font size. Give a comma separated list (or use multiple times) to render several sizes from one face; OUTPUT_FILE must then contain \"{size}\"."
+        )
+        parser.add_argument("--estimate", dest="ESTIMATE", action="store_true",
+            help="Only print the size each output file would have, predicted from glyph metrics without rendering"
+        )
+        parser.add_argument("--fit-bytes", dest="FIT_BYTES",
+            type=int, default=None, metavar="N",
+            help="Use the largest size whose output file fits in N bytes (of the sizes given with -s, or any up to {})".format(FIT_MAX_SIZE)
+        )
+        parser.add_argument("--gamma", dest="GAMMA",
+            type=float, default=1.0,
+            help="Gamma applied to antialiased pixels; above 1 makes thin strokes heavier on panels where they look washed out (default 1)"
+        )
+        parser.add_argument("--contrast", dest="CONTRAST",
+            type=float, default=1.0,
+            help="Stretch antialiased pixels away from mid grey by this factor, 1 or more (default 1)"
+        )
+        parser.add_argument("--threshold", dest="THRESHOLD",
+            type=int, default=None, metavar="1-255",
+            help="Turn antialiasing off: pixels from THRESHOLD up become solid, the rest empty"
+        )
+        parser.add_argument("--min-alpha", dest="MIN_ALPHA",
+            type=int, default=0, metavar="0-255",
+            help="Make pixels fainter than MIN_ALPHA empty (default 0)"
+        )
+        parser.add_argument("--c-header", dest="C_HEADER", action="store_true",
+            help="Also write each output as a C/C++ header with a PROGMEM byte array (OUTPUT_FILE with .h instead of .vlw)"
+        )
+        parser.add_argument("--hash", dest="HASH",
+            choices=HashSink.ALGORITHMS, default=None,
+            help="Also write a hash of each output file next to it (OUTPUT_FILE.<algorithm>, in sha256sum format)"
+        )
+        parser.add_argument("--compress", dest="COMPRESS",
+            choices=list(CompressedSink.EXTENSIONS), default=None,
+            help="Also write each output compressed (OUTPUT_FILE.z for zlib, OUTPUT_FILE.xz for lzma)"
+        )
+        parser.add_argument("-q", "--quiet", dest="QUIET", action="count", default=0,
+            help="Print less (use twice for errors only)"
+        )
+        parser.add_argument("-v", "--verbose", dest="VERBOSE", action="count", default=0,
+            help="Print more (e.g. every character processed)"
+        )
+        parser.add_argument("--stats", dest="STATS", nargs="?", const="text",
+            choices=["text", "json"], default=None,
+            help="Print time per stage, glyph and byte counts and largest glyphs when done (as text, or json)"
+        )
+        parser.add_argument("INPUT_FILE", nargs="+",
+            help="Outline font to use as source; further fonts are fallbacks (in priority order) for characters it lacks, e.g. CJK or symbols"
+        )
+        parser.add_argument("OUTPUT_FILE",
+            help="VLW file to write (\"{size}\" is replaced with the font size, \"{name}\" with the font's family and style name)"
+        )
+        
+        return parser.parse_args()
+    
+    args = get_args()
+    # print (args)
+    
+    import logging
+    from AtomicFile import AtomicFile
+    from Stats import Stats
+    from VlwReader import VlwReader
+    
+    # log to stderr, so stdout only has the --stats report
+    logging.basicConfig(format="%(message)s",
+        level=logging.INFO + 10 * (args.QUIET - args.VERBOSE))
+    log = logging.getLogger("vlwconv")
+    stats = Stats()
+    
+    input_file, *fallback_files = args.INPUT_FILE
+    for file_path in args.INPUT_FILE:
+        if (not path.isfile(file_path)):
+            raise Exception("Input file (\"{}\") does not exist.".format(file_path))
+    
+    sizes = list(dict.fromkeys(args.SIZES)) # drop duplicates, keep order
+    if (len(sizes) == 0 and args.FIT_BYTES is None):
+        raise Exception("No font size given.")
+    for size in sizes:
+        if (size <= 0):
+            raise Exception("Font size must be greater than 0.")
+    if (len(sizes) > 1 and args.FIT_BYTES is None and "{size}" not in args.OUTPUT_FILE):
+        raise Exception("Output file name must contain \"{size}\" when converting multiple sizes.")
+    if (args.FIT_BYTES is not None and args.FIT_BYTES <= 0):
+        raise Exception("--fit-bytes must be greater than 0.")
+    if (args.ESTIMATE and args.UPDATE):
+        raise Exception("Can't estimate and update at once.")
+    if (fallback_files and args.UPDATE):
+        raise Exception("Can't update with fallback fonts.")
+    bitmap_lut = make_bitmap_lut(args.GAMMA, args.CONTRAST, args.THRESHOLD, args.MIN_ALPHA)
+    
+    for file_path in args.CHARS_FROM:
+        if (file_path != "-" and not path.isfile(file_path)):
+            raise Exception("Text file (\"{}\") does not exist.".format(file_path))
+    
+    with stats.stage("charset"):
+        charset = gen_charset(args.BLOCKS, args.RANGES, args.CHARS,
+            args.EXCLUDE_BLOCKS, args.EXCLUDE_RANGES, args.EXCLUDE_CHARS,
+            args.CHARS_FROM)
+    if (not charset):
+        raise Exception("No characters to generate. Make sure to specify blocks, ranges, chars, or text files.")
+    # print (charset)
+    
+    if (args.ALL_FACES and args.TTC_INDEX != 0):
+        raise Exception("Can't select a TTC index when converting all faces.")
+    
+    # load freetype face(s) once, then render every size from them
+    with stats.stage("face_load"):
+        if args.ALL_FACES:
+            font, faces = load_all_faces(input_file)
+        else:
+            font = input_file
+            faces = [load_face(input_file, args.TTC_INDEX)]
+        fallback_faces = [load_face(file_path) for file_path in fallback_files]
+    if (len(faces) > 1 and "{name}" not in args.OUTPUT_FILE):
+        raise Exception("Output file name must contain \"{name}\" when converting multiple faces.")
+    
+    # only render what the fonts actually have
+    # each face is chained with the fallback faces, which render whatever it
+    # lacks; chains are (face, charmap) per face of the chain, by face index
+    with stats.stage("charmap"):
+        fallback_charmaps = [face_charmap(fallback, charset) for fallback in fallback_faces]
+    charmaps: dict[int, list[tuple[int, int]]] = {} # by face index
+    chains: dict[int, list[tuple["freetype.Face", list[tuple[int, int]]]]] = {}
+    for face in faces:
+        with stats.stage("charmap"):
+            routed = route_charmaps([face_charmap(face, charset)] + fallback_charmaps)
+        charmaps[face.face_index] = routed[0]
+        chains[face.face_index] = list(zip([face] + fallback_faces, routed))
+        for fallback, charmap in chains[face.face_index][1:]:
+            log.info("{} covers {} codepoints {} lacks.".format(face_name(fallback), len(charmap), face_name(face)))
+        
+        missing = len(charset) - sum(len(charmap) for f, charmap in chains[face.face_index])
+        stats.count("requested", len(charset))
+        stats.count("missing", missing)
+        if missing > 0:
+            log.info("{} has no glyph for {} of {} requested codepoints.".format(face_name(face), missing, len(charset)))
+    
+    # sizes to convert each face at (by face index)
+    face_sizes: dict[int, list[int]] = {face.face_index: sizes for face in faces}
+    if args.FIT_BYTES is not None:
+        for face in faces:
+            with stats.stage("fit"):
+                size = fit_size(face, charmaps[face.face_index], args.FIT_BYTES, sizes, chains[face.face_index][1:])
+            if size is None:
+                raise Exception("{} doesn't fit in {} bytes at any size tried.".format(face_name(face), args.FIT_BYTES))
+            log.info("{} fits in {} bytes up to size {}.".format(face_name(face), args.FIT_BYTES, size))
+            face_sizes[face.face_index] = [size]
+    
+    # name each face's outputs get for "{name}"; faces of a collection
+    # sharing a name are told apart by their face index
+    face_names = [face_name(face) for face in faces]
+    output_names = {face.face_index: name if face_names.count(name) == 1 else "{} {}".format(name, face.face_index)
+        for face, name in zip(faces, face_names)}
+    
+    # (face, size, output file) for every file to write
+    targets = [(face, size, output_file_for(args.OUTPUT_FILE, size, output_names[face.face_index]))
+        for face in faces for size in face_sizes[face.face_index]]
+    output_files = [output_file for face, size, output_file in targets]
+    for output_file in output_files:
+        if (output_files.count(output_file) > 1):
+            raise Exception("More than one face or size would be written to \"{}\".".format(output_file))
+    
+    if args.ESTIMATE:
+        for face, size, output_file in targets:
+            with stats.stage("estimate"):
+                estimate = estimate_size(face, size, charmaps[face.face_index], chains[face.face_index][1:])
+            stats.add_output(output_file, size, estimate)
+            glyph_count = sum(len(charmap) for f, charmap in chains[face.face_index])
+            print ("{}: {} bytes ({}px, {} glyphs)".format(output_file, estimate, size, glyph_count))
+        
+        if args.STATS == "json":
+            print (stats.report_json())
+        elif args.STATS == "text":
+            print (stats.report_text(), end="")
+        sys.exit()
+    
+    # files written alongside each output in the same pass (by --c-header,
+    # --hash and --compress), file name -> (file mode, function making its
+    # sink writing to an open file)
+    def extra_outputs(output_file: str) -> dict[str, tuple[str, Callable[[IO], OutputSink]]]:
+        outputs = {}
+        if args.C_HEADER:
+            name = CArraySink.identifier(path.splitext(path.basename(output_file))[0])
+            outputs[path.splitext(output_file)[0] + ".h"] = ("w", lambda io: CArraySink(io, name))
+        if args.HASH is not None:
+            outputs[output_file + "." + args.HASH] = ("w", lambda io: HashSink(io, path.basename(output_file), args.HASH))
+        if args.COMPRESS is not None:
+            outputs[output_file + CompressedSink.EXTENSIONS[args.COMPRESS]] = ("wb", lambda io: CompressedSink(io, args.COMPRESS))
+        
+        return outputs
+    
+    T = TypeVar("T")
+    
+    # write output_file and its extra outputs in one pass of write(stream),
+    # returns what write returns
+    # every file is written under a temporary name and only renamed into place
+    # once all of them are complete, so a failed or interrupted run leaves no
+    # truncated file behind
+    def write_outputs(output_file: str, write: Callable[[OutputSink], T]) -> T:
+        files = [AtomicFile(output_file)]
+        try:
+            sinks = [files[0].file]
+            for file_path, (mode, make_sink) in extra_outputs(output_file).items():
+                files.append(AtomicFile(file_path, mode))
+                sinks.append(make_sink(files[-1].file))
+            with TeeSink(sinks) as out:
+                result = write(out)
+            for f in files:
+                f.commit()
+        finally:
+            for f in files:
+                f.discard()
+        
+        return result
+    
+    for face, size, output_file in targets:
+        if (path.exists(output_file) and not args.UPDATE):
+            raise Exception("Output file (\"{}\") already exists.".format(output_file))
+        for file_path in extra_outputs(output_file):
+            if (file_path == output_file):
+                raise Exception("Output file (\"{}\") would be overwritten by its own header.".format(output_file))
+            if (path.exists(file_path) and not args.UPDATE):
+                raise Exception("Output file (\"{}\") already exists.".format(file_path))
+    
+    cache = None
+    cache_fonts: dict[int, str] = {} # GlyphCache.font_key by face index
+    fallback_cache_fonts = [""] * len(fallback_faces)
+    if args.CACHE_DIR is not None:
+        with stats.stage("cache_open"):
+            import freetype
+            from GlyphCache import GlyphCache
+            cache = GlyphCache(args.CACHE_DIR, args.CACHE_SIZE << 20)
+            font_hash = GlyphCache.font_hash(font)
+            for face in faces:
+                cache_fonts[face.face_index] = GlyphCache.font_key_from_hash(font_hash, face.face_index, freetype.FT_LOAD_RENDER, freetype.version())
+            fallback_cache_fonts = [GlyphCache.font_key(file_path, 0, freetype.FT_LOAD_RENDER, freetype.version()) for file_path in fallback_files]
+    
+    jobs = resolve_jobs(args.JOBS)
+    pool = None
+    pool_chunks = 1
+    if jobs > 1:
+        with stats.stage("pool_start"):
+            pool = make_pool([font] + fallback_files, jobs)
+        pool_chunks = jobs * CHUNKS_PER_JOB
+    
+    try:
+        for face, size, output_file in targets:
+            charmap = charmaps[face.face_index]
+            cache_font = cache_fonts.get(face.face_index, "")
+            extras = list(extra_outputs(output_file))
+            
+            if args.UPDATE and path.exists(output_file):
+                # write next to existing file, then swap it in once complete
+                def patch(out: OutputSink) -> tuple[int, int]:
+                    with VlwReader.open(output_file) as base:
+                        return patch_font(face, size, charmap, base, out, pool, pool_chunks, cache, cache_font, bitmap_lut)
+                
+                with stats.stage("patch"):
+                    added, removed = write_outputs(output_file, patch)
+                stats.count("glyphs_added", added)
+                stats.count("glyphs_removed", removed)
+                for file_path in [output_file] + extras:
+                    stats.add_output(file_path, size, path.getsize(file_path))
+                log.info("Updated \"{}\": {} glyphs added, {} removed.".format(output_file, added, removed))
+                continue
+            
+            # (face, charmap, cache font, pool font) per face of the chain
+            parts = [(face, charmap, cache_font, 0)] + [(fallback, fallback_charmap, fallback_cache_fonts[i], i + 1)
+                for i, (fallback, fallback_charmap) in enumerate(chains[face.face_index][1:])]
+            
+            vlw = font_info(face, size)
+            vlw.bitmap_lut = bitmap_lut
+            glyphs = iter_merged_glyphs(parts, size, pool, pool_chunks, cache)
+            if args.STATS is not None:
+                # (face in chain, glyph index) by codepoint
+                glyph_keys = {c: (pool_f, idx) for f, part_charmap, cache_f, pool_f in parts for c, idx in part_charmap}
+                glyphs = stats.track_glyphs(glyphs, size, glyph_keys=glyph_keys)
+                for f, part_charmap, cache_f, pool_f in parts:
+                    stats.count("shared_glyphs", len(part_charmap) - len(set(idx for c, idx in part_charmap)))
+            
+            # glyphs are written as they are rendered, so memory use stays
+            # bounded however many glyphs there are; extra outputs are
+            # encoded from the same pass
+            with stats.stage("write"):
+                write_outputs(output_file, lambda out: vlw.write_glyph_stream(out, glyphs))
+            for file_path in [output_file] + extras:
+                stats.add_output(file_path, size, path.getsize(file_path))
+                log.info("Wrote \"{}\".".format(file_path))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if cache is not None:
+            cache.close()
     
-    with open(output_file, "wb") as f:
-        vlw.write_stream(f)
+    if args.STATS == "json":
+        print (stats.report_json())
+    elif args.STATS == "text":
+        print (stats.report_text(), end="")